@@ -0,0 +1,73 @@
+import hashlib
+import logging
+from functools import wraps
+from typing import Optional
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CACHE = 'results'
+VERSION_CACHE = 'results_version'
+VERSION_KEY = 'dataset_version'
+
+# Cached responses are keyed on the dataset version, which is bumped once a crawl's results are
+# written: entries for an older version are never read again and are evicted as the cache fills.
+# Rows written while a crawl runs show up once it finishes, or once their entries time out.
+
+def bump_dataset_version():
+    cache = caches[VERSION_CACHE]
+    try:
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            # No version yet: readers treat that as 1, so start past it
+            cache.set(VERSION_KEY, 2, timeout=None)
+    except Exception as e:
+        logger.error(f"Error bumping results cache version: {str(e)}")
+
+async def response_cache_key(request) -> Optional[str]:
+    cache = caches[VERSION_CACHE]
+    try:
+        version = await cache.aget(VERSION_KEY)
+        if version is None:
+            await cache.aadd(VERSION_KEY, 1, timeout=None)
+            version = await cache.aget(VERSION_KEY, 1)
+    except Exception as e:
+        logger.warning(f"Results cache unavailable: {str(e)}")
+        return None
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.sha256(f'{request.path}?{params}'.encode('utf-8')).hexdigest()
+    return f'response:v{version}:{digest}'
+
+async def get_cached_response(key: Optional[str]) -> Optional[bytes]:
+    if key is None:
+        return None
+    try:
+        return await caches[RESULTS_CACHE].aget(key)
+    except Exception as e:
+        logger.warning(f"Error reading results cache: {str(e)}")
+        return None
+
+async def cache_response(key: Optional[str], content: bytes):
+    if key is None:
+        return
+    try:
+        await caches[RESULTS_CACHE].aset(key, content)
+    except Exception as e:
+        logger.warning(f"Error writing results cache: {str(e)}")
+
+def cached_response(get):
+    """Serve an async JSON view's GET from the results cache, storing its 200 responses."""
+    @wraps(get)
+    async def wrapper(self, request, *args, **kwargs):
+        cache_key = await response_cache_key(request)
+        content = await get_cached_response(cache_key)
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
+        response = await get(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache_response(cache_key, response.content)
+        return response
+    return wrapper
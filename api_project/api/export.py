@@ -0,0 +1,40 @@
+import csv
+from typing import AsyncIterator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from .persistence import MODEL_FIELDS, decode_json_fields
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_CHUNK_SIZE = 2000
+
+class _Echo:
+    # csv.writer target that hands back each formatted line instead of buffering it
+    def write(self, value):
+        return value
+
+async def _rows(queryset: QuerySet) -> AsyncIterator[dict]:
+    # aiterator() reads through a server-side cursor EXPORT_CHUNK_SIZE rows at a time
+    async for row in queryset.values(*MODEL_FIELDS).aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row
+
+async def export_ndjson(queryset: QuerySet) -> AsyncIterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    lines = []
+    async for row in _rows(queryset):
+        lines.append(encoder.encode(decode_json_fields(row)) + '\n')
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+async def export_csv(queryset: QuerySet) -> AsyncIterator[str]:
+    writer = csv.writer(_Echo())
+    lines = [writer.writerow(MODEL_FIELDS)]
+    async for row in _rows(queryset):
+        lines.append(writer.writerow([row[name] for name in MODEL_FIELDS]))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
@@ -0,0 +1,55 @@
+import json
+import re
+from typing import Optional
+from django.db.models import Exists, OuterRef, QuerySet
+
+# Canadian postal codes, stored without the space ("A1A1A1") so prefixes compare simply
+POSTAL_CODE_PATTERN = re.compile(r'\b([A-Z]\d[A-Z])\s?-?(\d[A-Z]\d)\b', re.IGNORECASE)
+
+def normalize_postal_code(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    match = POSTAL_CODE_PATTERN.search(value)
+    if match:
+        return (match.group(1) + match.group(2)).upper()
+    return re.sub(r'\s+', '', value).upper()[:16] or None
+
+def _column(row: dict, *names: str) -> Optional[str]:
+    # The grid's headers aren't fixed; match them loosely ("City", "City/Town", "Postal Code", ...),
+    # trying names in order of preference
+    for name in names:
+        for key, value in row.items():
+            if name in key.lower():
+                return value.strip() if isinstance(value, str) and value.strip() else None
+    return None
+
+def parse_location(row: dict) -> dict:
+    """Normalize one scraped practice-location row into PracticeLocation fields."""
+    postal_code = normalize_postal_code(_column(row, 'postal', 'zip'))
+    if postal_code is None:
+        # Some layouts only have a one-line address with the postal code at the end
+        postal_code = normalize_postal_code(
+            next((m.group(0) for value in row.values() if isinstance(value, str)
+                  for m in [POSTAL_CODE_PATTERN.search(value)] if m), None))
+    return {
+        'address': _column(row, 'address', 'street', 'location'),
+        'city': _column(row, 'city', 'town', 'municipality'),
+        'postal_code': postal_code,
+        'data': json.dumps(row, ensure_ascii=False),
+    }
+
+def filter_by_location(queryset: QuerySet, city: Optional[str] = None,
+                       postal_prefix: Optional[str] = None) -> QuerySet:
+    """Keep registrants with a practice location in city and/or under postal_prefix."""
+    from .models import PracticeLocation
+
+    locations = PracticeLocation.objects.filter(registrant=OuterRef('pk'))
+    if city:
+        # Compiles to UPPER(city) = UPPER(%s), served by the Upper('city') index
+        locations = locations.filter(city__iexact=city.strip())
+    if postal_prefix:
+        # LIKE 'A1A%' on the varchar_pattern_ops index
+        locations = locations.filter(postal_code__startswith=re.sub(r'\s+', '', postal_prefix).upper())
+    if not city and not postal_prefix:
+        return queryset
+    return queryset.filter(Exists(locations))
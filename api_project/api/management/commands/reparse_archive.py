@@ -0,0 +1,44 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from scraper.public_registry.archive import DEFAULT_ARCHIVE_DIR, PageArchive
+from scraper.public_registry.parsers import DEFAULT_PARSER, PARSER_ENGINES
+from scraper.public_registry.reparse import DEFAULT_CHUNK_SIZE, reparse_archive
+from api.cache import bump_dataset_version
+from api.persistence import DEFAULT_BATCH_SIZE, upsert_results
+
+class Command(BaseCommand):
+    help = "Rebuild scraper results by parsing the registrant pages in the page archive again"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--archive-dir", help="Page archive directory (default SCRAPER_ARCHIVE_DIR or page_archive)")
+        parser.add_argument("--crawl-id", help="Only pages fetched by this crawl (default: latest page of every registrant)")
+        parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Results per database write")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Pages per parser task")
+        parser.add_argument("--keep-errors", action="store_true",
+                            help="Also write pages that fail to parse, replacing their stored results")
+
+    def handle(self, *args, **options):
+        directory = options["archive_dir"] or os.environ.get("SCRAPER_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+        if not os.path.isdir(directory):
+            raise CommandError(f"No page archive at {directory}")
+        archive = PageArchive(directory)
+
+        def report(stats):
+            self.stdout.write(f"{stats.pages} pages parsed, {stats.written} written "
+                              f"({stats.pages_per_second:.1f} pages/s)")
+
+        try:
+            stats = reparse_archive(archive, upsert_results, crawl_id=options["crawl_id"], parser=options["parser"],
+                                    workers=options["workers"], batch_size=options["batch_size"],
+                                    chunk_size=options["chunk_size"], keep_errors=options["keep_errors"],
+                                    on_progress=report)
+        finally:
+            archive.close()
+        if stats.written:
+            bump_dataset_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-parsed {stats.pages} pages in {stats.elapsed:.1f}s ({stats.pages_per_second:.1f} pages/s) "
+            f"with {options['workers']} workers: {stats.parsed} parsed, {stats.failed} failed, "
+            f"{stats.written} results written"))
@@ -0,0 +1,20 @@
+import logging
+from django.conf import settings
+from scraper.public_registry.metrics import (METRICS_KEY, REGISTRY, decode_snapshots, merge_snapshots,
+                                             render_snapshot)
+from scraper.public_registry.redis_client import close_redis, redis_from_url
+
+logger = logging.getLogger(__name__)
+
+async def render_metrics() -> str:
+    """Prometheus text for every worker's published metrics plus this process' own."""
+    snapshots = [REGISTRY.snapshot()]
+    client = redis_from_url(settings.CELERY_BROKER_URL)
+    try:
+        snapshots.extend(decode_snapshots(await client.hgetall(METRICS_KEY)))
+    except Exception as e:
+        # Still serve this process' metrics
+        logger.warning(f"Error reading worker metrics: {str(e)}")
+    finally:
+        await close_redis(client)
+    return render_snapshot(merge_snapshots(snapshots))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_userids(apps, schema_editor):
+    # Keep the most recently inserted row for every registrant
+    ScraperResult = apps.get_model('api', 'ScraperResult')
+    duplicates = (
+        ScraperResult.objects.values('userid')
+        .annotate(row_count=Count('id'), latest_id=Max('id'))
+        .filter(row_count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        ScraperResult.objects.filter(userid=duplicate['userid']).exclude(id=duplicate['latest_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_scraperresult_practice_locations_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_userids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='scraperresult',
+            name='practice_locations',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scraperresult',
+            name='professional_corporation',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scraperresult',
+            name='registrant_history',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scraperresult',
+            name='userid',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
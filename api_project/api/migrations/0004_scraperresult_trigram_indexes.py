@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_scraperresult_userid_unique'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AlterField(
+            model_name='scraperresult',
+            name='registration_number',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scraperresult',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='api_result_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='scraperresult',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name_used_in_practice'), name='gin_trgm_ops'), name='api_result_practice_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='scraperresult',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('userid'), name='gin_trgm_ops'), name='api_result_userid_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='scraperresult',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('registration_number'), name='gin_trgm_ops'), name='api_result_reg_number_trgm'),
+        ),
+    ]
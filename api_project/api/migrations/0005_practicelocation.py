@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+import json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+def backfill_practice_locations(apps, schema_editor):
+    from api.locations import parse_location
+
+    ScraperResult = apps.get_model('api', 'ScraperResult')
+    PracticeLocation = apps.get_model('api', 'PracticeLocation')
+    batch = []
+    results = ScraperResult.objects.exclude(practice_locations=None).values_list('id', 'practice_locations')
+    for registrant_id, practice_locations in results.iterator(chunk_size=2000):
+        if isinstance(practice_locations, str):
+            try:
+                practice_locations = json.loads(practice_locations)
+            except ValueError:
+                continue
+        for row in practice_locations or []:
+            if isinstance(row, dict):
+                batch.append(PracticeLocation(registrant_id=registrant_id, **parse_location(row)))
+        if len(batch) >= 2000:
+            PracticeLocation.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        PracticeLocation.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_scraperresult_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PracticeLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.TextField(blank=True, null=True)),
+                ('city', models.CharField(blank=True, max_length=255, null=True)),
+                ('postal_code', models.CharField(blank=True, max_length=16, null=True)),
+                ('data', models.TextField(blank=True, null=True)),
+                ('registrant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='api.scraperresult')),
+            ],
+            options={
+                'indexes': [models.Index(django.db.models.functions.text.Upper('city'), name='api_location_city_upper'), models.Index(fields=['postal_code'], name='api_location_postal_code', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+        migrations.RunPython(backfill_practice_locations, migrations.RunPython.noop),
+    ]
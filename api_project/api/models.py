@@ -1,10 +1,12 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class ScraperResult(models.Model):
     name = models.CharField(max_length=255)
-    userid = models.CharField(max_length=255)
+    userid = models.CharField(max_length=255, unique=True)
     url = models.URLField()
-    registration_number = models.CharField(max_length=255, null=True, blank=True)
+    registration_number = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     registration_date = models.DateField(null=True, blank=True)
     name_used_in_practice = models.CharField(max_length=255, null=True, blank=True)
     registrant_type = models.CharField(max_length=255, null=True, blank=True)
@@ -15,5 +17,32 @@ class ScraperResult(models.Model):
     practice_locations = models.TextField(null=True, blank=True)  # Changed to TextField
     professional_corporation = models.TextField(null=True, blank=True)  # Changed to TextField
 
+    class Meta:
+        # Trigram indexes on the UPPER(...) expressions that icontains compiles to on Postgres,
+        # so substring searches use an index scan instead of reading the whole table
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='api_result_name_trgm'),
+            GinIndex(OpClass(Upper('name_used_in_practice'), name='gin_trgm_ops'), name='api_result_practice_name_trgm'),
+            GinIndex(OpClass(Upper('userid'), name='gin_trgm_ops'), name='api_result_userid_trgm'),
+            GinIndex(OpClass(Upper('registration_number'), name='gin_trgm_ops'), name='api_result_reg_number_trgm'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.userid})"
+
+class PracticeLocation(models.Model):
+    # One row per entry of ScraperResult.practice_locations, normalized for location queries
+    registrant = models.ForeignKey(ScraperResult, on_delete=models.CASCADE, related_name='locations')
+    address = models.TextField(null=True, blank=True)
+    city = models.CharField(max_length=255, null=True, blank=True)
+    postal_code = models.CharField(max_length=16, null=True, blank=True)  # Uppercase, no spaces
+    data = models.TextField(null=True, blank=True)  # The scraped row as JSON
+
+    class Meta:
+        indexes = [
+            models.Index(Upper('city'), name='api_location_city_upper'),
+            models.Index(fields=['postal_code'], name='api_location_postal_code', opclasses=['varchar_pattern_ops']),
+        ]
+
     def __str__(self):
-        return f"{self.name} ({self.userid})"
\ No newline at end of file
+        return f"{self.city} {self.postal_code} ({self.registrant_id})"
@@ -0,0 +1,100 @@
+import base64
+import json
+from typing import List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q, QuerySet
+
+MAX_PER_PAGE = 1000
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(position: dict, backwards: bool = False) -> str:
+    data = json.dumps({'p': position, 'b': backwards}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[dict, bool]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return dict(data['p']), bool(data['b'])
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {str(e)}")
+
+@sync_to_async
+def estimate_count(queryset: QuerySet) -> int:
+    """The planner's row estimate for queryset, which costs no scan (unlike COUNT(*))."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+class KeysetPaginator:
+    # Pages by the last seen values of the queryset's ordering keys (with id as tie-breaker)
+    # instead of OFFSET, so every page is one index range scan however deep it is.
+    # Cursors encode that position; they stay valid while rows are inserted or deleted.
+    def __init__(self, queryset: QuerySet, per_page: int = 10, fields: Optional[List[str]] = None):
+        self.per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        self.keys = self._ordering_keys(queryset)
+        self.fields = fields
+        if fields is not None:
+            # Rows are fetched as dicts of the requested fields plus the keys the cursors need
+            key_names = [name for name, _ in self.keys]
+            queryset = queryset.values(*dict.fromkeys(fields + key_names))
+        self.queryset = queryset
+
+    @staticmethod
+    def _ordering_keys(queryset: QuerySet) -> List[Tuple[str, bool]]:
+        keys = []
+        for field in queryset.query.order_by or ['id']:
+            if not isinstance(field, str):
+                raise ValueError("Keyset pagination needs the queryset ordered by field names")
+            name = field.lstrip('-')
+            keys.append(('id' if name == 'pk' else name, field.startswith('-')))
+        if 'id' not in [name for name, _ in keys]:
+            keys.append(('id', False))
+        return keys
+
+    async def page(self, cursor: Optional[str] = None) -> dict:
+        position, backwards = decode_cursor(cursor) if cursor else (None, False)
+        queryset = self.queryset
+        if position is not None:
+            if set(position) != {name for name, _ in self.keys}:
+                raise InvalidCursor("Cursor does not match this query")
+            queryset = queryset.filter(self._beyond(position, backwards))
+        if backwards:
+            queryset = queryset.order_by(*[name if descending else f'-{name}' for name, descending in self.keys])
+
+        rows = [row async for row in queryset[:self.per_page + 1]]
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        positions = [self._position(row) for row in rows]
+        if self.fields is not None:
+            rows = [{name: row[name] for name in self.fields} for row in rows]
+
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else position is not None
+        return {
+            'results': rows,
+            'next': encode_cursor(positions[-1]) if rows and has_next else None,
+            'previous': encode_cursor(positions[0], backwards=True) if rows and has_previous else None,
+        }
+
+    def _position(self, row) -> dict:
+        return {name: row[name] if isinstance(row, dict) else getattr(row, name) for name, _ in self.keys}
+
+    def _beyond(self, position: dict, backwards: bool) -> Q:
+        # (a, b) after (x, y) in the page direction: a beyond x, or a = x and b beyond y
+        condition = Q()
+        for i, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != backwards else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[name]})
+            for previous_name, _ in self.keys[:i]:
+                step &= Q(**{previous_name: position[previous_name]})
+            condition |= step
+        return condition
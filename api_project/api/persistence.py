@@ -0,0 +1,78 @@
+import json
+from dataclasses import asdict, is_dataclass
+from typing import Iterable
+from django.db import transaction
+from .locations import parse_location
+from .models import PracticeLocation, ScraperResult
+
+# Computed once instead of per result
+MODEL_FIELDS = [f.name for f in ScraperResult._meta.concrete_fields]
+UPDATE_FIELDS = [name for name in MODEL_FIELDS if name not in ('id', 'userid')]
+JSON_FIELDS = ('registrant_history', 'practice_locations', 'professional_corporation')
+
+DEFAULT_BATCH_SIZE = 500
+
+def to_model(result) -> ScraperResult:
+    data = asdict(result) if is_dataclass(result) else dict(result)
+    # Remove any keys that aren't in the ScraperResult model
+    filtered_data = {k: v for k, v in data.items() if k in MODEL_FIELDS and k != 'id'}
+    for name in JSON_FIELDS:
+        if isinstance(filtered_data.get(name), (list, dict)):
+            filtered_data[name] = json.dumps(filtered_data[name], ensure_ascii=False)
+    return ScraperResult(**filtered_data)
+
+def decode_json_fields(row: dict) -> dict:
+    # The JSON columns hold serialized JSON; decode them for API output
+    for name in JSON_FIELDS:
+        value = row.get(name)
+        if isinstance(value, str):
+            try:
+                row[name] = json.loads(value)
+            except ValueError:
+                pass
+    return row
+
+def upsert_results(results: Iterable, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Insert or update scraped results keyed on ``userid``, and replace their practice locations."""
+    written = 0
+    batch = []
+    for result in results:
+        batch.append(to_model(result))
+        if len(batch) >= batch_size:
+            written += _write_batch(batch)
+            batch = []
+    if batch:
+        written += _write_batch(batch)
+    return written
+
+def _write_batch(batch) -> int:
+    # Postgres rejects an ON CONFLICT statement that touches the same row twice,
+    # so the last result for a userid within a batch wins
+    rows = list({row.userid: row for row in batch}.values())
+    with transaction.atomic():
+        ScraperResult.objects.bulk_create(
+            rows,
+            batch_size=len(rows),
+            update_conflicts=True,
+            unique_fields=['userid'],
+            update_fields=UPDATE_FIELDS,
+        )
+        _write_locations(rows)
+    return len(rows)
+
+def _write_locations(rows):
+    # bulk_create doesn't return the ids of upserted rows before Django 5.0
+    ids = dict(ScraperResult.objects.filter(userid__in=[row.userid for row in rows]).values_list('userid', 'id'))
+    PracticeLocation.objects.filter(registrant_id__in=ids.values()).delete()
+    locations = []
+    for row in rows:
+        practice_locations = row.practice_locations
+        if isinstance(practice_locations, str):
+            try:
+                practice_locations = json.loads(practice_locations)
+            except ValueError:
+                continue
+        for location in practice_locations or []:
+            if isinstance(location, dict):
+                locations.append(PracticeLocation(registrant_id=ids[row.userid], **parse_location(location)))
+    PracticeLocation.objects.bulk_create(locations, batch_size=1000)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+from celery import states
+from django.conf import settings
+from django_celery_results.models import TaskResult
+from scraper.public_registry.progress import decode_progress, progress_channel, progress_key
+from scraper.public_registry.redis_client import close_redis, redis_from_url
+
+logger = logging.getLogger(__name__)
+
+# Idle streams send a comment this often, which also re-checks whether the task died
+KEEPALIVE_INTERVAL = 15.0
+# Django doesn't notice a client disconnecting from a streaming response, so a stream is
+# ended after this long and the client's EventSource reconnects after RECONNECT_DELAY;
+# otherwise a closed tab would hold its pub/sub connection until the crawl finished
+MAX_STREAM_DURATION = 300.0
+RECONNECT_DELAY = 3.0
+
+async def get_progress(task_id: str) -> Optional[dict]:
+    """Latest progress snapshot the crawl published, or None."""
+    client = redis_from_url(settings.CELERY_BROKER_URL)
+    try:
+        return decode_progress(await client.hgetall(progress_key(task_id))) or None
+    except Exception as e:
+        logger.warning(f"Error reading progress for {task_id}: {str(e)}")
+        return None
+    finally:
+        await close_redis(client)
+
+def _event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+async def _task_status(task_id: str) -> Optional[str]:
+    task = await TaskResult.objects.filter(task_id=task_id).values('status').afirst()
+    return task['status'] if task else None
+
+async def progress_events(task_id: str) -> AsyncIterator[str]:
+    """Server-sent events: the current snapshot, then every update until the crawl ends or
+    MAX_STREAM_DURATION passes; clients close the stream once the crawl is finished."""
+    client = redis_from_url(settings.CELERY_BROKER_URL)
+    pubsub = client.pubsub()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_STREAM_DURATION
+    try:
+        yield f"retry: {int(RECONNECT_DELAY * 1000)}\n\n"
+        # Subscribe before reading the snapshot so no update falls in between
+        await pubsub.subscribe(progress_channel(task_id))
+        snapshot = decode_progress(await client.hgetall(progress_key(task_id)))
+        if snapshot:
+            yield _event('progress', snapshot)
+            if snapshot.get('stage') == 'finished':
+                return
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # The client reconnects and gets the current snapshot first
+                return
+            message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                               timeout=min(KEEPALIVE_INTERVAL, remaining))
+            if message is None:
+                # A crawl that failed or was revoked never publishes "finished"
+                status = await _task_status(task_id)
+                if status in states.READY_STATES:
+                    yield _event('status', {'status': status})
+                    return
+                yield ": keepalive\n\n"
+                continue
+            snapshot = json.loads(message['data'])
+            yield _event('progress', snapshot)
+            if snapshot.get('stage') == 'finished':
+                return
+    except Exception as e:
+        logger.error(f"Error streaming progress for {task_id}: {str(e)}")
+        yield _event('error', {'error': str(e)})
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await close_redis(pubsub)
+        finally:
+            await close_redis(client)
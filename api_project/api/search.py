@@ -0,0 +1,31 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import FloatField, Q, QuerySet, Value
+from django.db.models.functions import Cast, Greatest
+
+# Fields matched by substring search; each has a trigram index on UPPER(field) (migration 0004)
+SEARCH_FIELDS = ['name', 'name_used_in_practice', 'userid', 'registration_number']
+# Fields an exact match short-circuits on, through their unique/b-tree indexes
+EXACT_FIELDS = ['userid', 'registration_number']
+
+async def search_results(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter queryset to results matching query, annotated with a `rank` and ordered by it."""
+    query = query.strip()
+    if not query:
+        return queryset.annotate(rank=Value(1.0, output_field=FloatField())).order_by('id')
+
+    # Looking up a registrant by id or registration number needs no substring scan
+    exact = Q()
+    for field in EXACT_FIELDS:
+        exact |= Q(**{field: query})
+    exact_matches = queryset.filter(exact)
+    if await exact_matches.aexists():
+        return exact_matches.annotate(rank=Value(1.0, output_field=FloatField())).order_by('id')
+
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__icontains': query})
+    # Rank by the best trigram similarity of any field (NULL fields are ignored by GREATEST).
+    # similarity() is a float4; as double precision the rank round-trips exactly through a
+    # keyset cursor, so rows tied with the last row of a page aren't skipped
+    rank = Cast(Greatest(*[TrigramSimilarity(field, query) for field in SEARCH_FIELDS]), FloatField())
+    return queryset.filter(matches).annotate(rank=rank).order_by('-rank', 'id')
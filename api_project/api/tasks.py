@@ -1,22 +1,132 @@
 # api_project/api/tasks.py
 
-from celery import shared_task
-from scraper.public_registry.main import run_scraper
-from .models import ScraperResult
+from asgiref.sync import sync_to_async
+from celery import chord, shared_task
+from django.conf import settings
+from django.db import close_old_connections
+from scraper.public_registry.archive import PageArchive
+from scraper.public_registry.checkpoint import CrawlCheckpoint
+from scraper.public_registry.main import discover_user_ids, run_scraper, scrape_user_ids
+from scraper.public_registry.metrics import CRAWL_DURATION, RedisMetricsPublisher
+from scraper.public_registry.progress import ProgressTracker, RedisProgressPublisher
+from scraper.public_registry.rate_limiter import create_rate_limiter
+from .cache import bump_dataset_version
+from .persistence import upsert_results
 import asyncio
 
-@shared_task
-def execute_scraper():
+def _archive():
+    return PageArchive() if settings.SCRAPER_ARCHIVE else None
+
+def _run_crawl(task_name, make_coroutine):
+    # Each task gets its own event loop; every worker draws from the same token bucket, so
+    # concurrent crawls and shards share the request budget
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    results = loop.run_until_complete(run_scraper())
-    loop.close()
-
-    for result in results:
-        data = result.__dict__
-        # Remove any keys that aren't in the ScraperResult model
-        model_fields = [f.name for f in ScraperResult._meta.get_fields()]
-        filtered_data = {k: v for k, v in data.items() if k in model_fields}
-        ScraperResult.objects.create(**filtered_data)
-    
-    return len(results)
\ No newline at end of file
+    rate_limiter = create_rate_limiter(settings.SCRAPER_RATE_LIMIT_BACKEND, url=settings.CELERY_BROKER_URL,
+                                       rate=settings.SCRAPER_RATE_LIMIT, key=settings.SCRAPER_RATE_LIMIT_KEY)
+    archive = _archive()
+
+    async def run():
+        # This worker's metrics are pushed to Redis while the crawl runs, for /api/metrics/
+        metrics = RedisMetricsPublisher.from_url(settings.CELERY_BROKER_URL)
+        metrics.start()
+        try:
+            with CRAWL_DURATION.time(task=task_name):
+                return await make_coroutine(rate_limiter, archive)
+        finally:
+            await metrics.close()
+
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.run_until_complete(rate_limiter.close())
+        if archive is not None:
+            archive.close()
+        loop.close()
+
+def _upsert_batch(batch):
+    # Crawls outlive CONN_MAX_AGE and dropped connections, and outside a request nothing else
+    # recycles the connection this thread holds
+    close_old_connections()
+    try:
+        return upsert_results(batch)
+    finally:
+        close_old_connections()
+
+# Results are upserted in batches while the crawl runs, on a single thread that owns the DB connection
+_write_results = sync_to_async(_upsert_batch, thread_sensitive=True)
+
+def _progress(task_id):
+    # Published under the id the API handed out, for task-status and its event stream
+    return ProgressTracker(RedisProgressPublisher.from_url(settings.CELERY_BROKER_URL, task_id))
+
+async def _finish_progress(task_id):
+    progress = _progress(task_id)
+    progress.set("stage", "finished")
+    await progress.close()
+
+@shared_task(bind=True)
+def execute_scraper(self, crawl_id=None):
+    # Each crawl checkpoints under its id; passing the id of an interrupted crawl resumes it
+    crawl_id = crawl_id or self.request.id
+    try:
+        return _run_crawl("execute_scraper",
+                          lambda rate_limiter, archive: run_scraper(crawl_id=crawl_id,
+                                                                    write_batch=_write_results,
+                                                                    rate_limiter=rate_limiter,
+                                                                    progress=_progress(self.request.id),
+                                                                    archive=archive))
+    finally:
+        # Cached /api/results/ responses are invalidated once per crawl, not per batch
+        bump_dataset_version()
+
+@shared_task(bind=True)
+def crawl_registry(self, crawl_id=None, shard_size=None):
+    # Sharded crawl: this task only runs the search, then replaces itself with a chord of
+    # scrape_registrants shards that any worker can pick up, summed by aggregate_shards.
+    # Shards record what they wrote in the crawl's checkpoint (so SCRAPER_CHECKPOINT_DIR must be
+    # shared by the workers) and resuming the crawl only shards the registrants still missing
+    crawl_id = crawl_id or self.request.id
+    shard_size = shard_size or settings.SCRAPER_SHARD_SIZE
+    # The search doesn't go through the rate limiter
+    user_ids = _run_crawl("crawl_registry",
+                          lambda rate_limiter, archive: discover_user_ids(crawl_id=crawl_id,
+                                                                          progress=_progress(self.request.id),
+                                                                          archive=archive))
+
+    if not user_ids:
+        asyncio.run(_finish_progress(self.request.id))
+        return {"crawl_id": crawl_id, "shards": 0, "discovered": 0, "written": 0}
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+    # The chord's callback takes over this task's id, so its status reports the whole crawl
+    return self.replace(chord(
+        [scrape_registrants.s(shard, crawl_id=crawl_id, progress_id=self.request.id) for shard in shards],
+        aggregate_shards.s(crawl_id=crawl_id, discovered=len(user_ids), progress_id=self.request.id),
+    ))
+
+@shared_task(bind=True, acks_late=True)
+def scrape_registrants(self, user_ids, crawl_id=None, progress_id=None):
+    # Writes are upserts, so a shard redelivered after a worker died is simply scraped again
+    written = _run_crawl("scrape_registrants",
+                         lambda rate_limiter, archive: scrape_user_ids(user_ids, num_workers=settings.SCRAPER_SHARD_WORKERS,
+                                                                       write_batch=_write_results,
+                                                                       rate_limiter=rate_limiter,
+                                                                       progress=_progress(progress_id or self.request.id),
+                                                                       archive=archive, crawl_id=crawl_id))
+    return {"user_ids": len(user_ids), "written": written}
+
+@shared_task
+def aggregate_shards(shard_results, crawl_id=None, discovered=0, progress_id=None):
+    bump_dataset_version()
+    if crawl_id:
+        checkpoint = CrawlCheckpoint(crawl_id).load()
+        if checkpoint.search_completed and all(user_id in checkpoint.written for user_id in checkpoint.discovered):
+            checkpoint.record_finished()
+    if progress_id:
+        asyncio.run(_finish_progress(progress_id))
+    return {
+        "crawl_id": crawl_id,
+        "shards": len(shard_results),
+        "discovered": discovered,
+        "written": sum(result["written"] for result in shard_results),
+    }
@@ -1,3 +1,174 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from scraper.public_registry.registrant_scraper import RegistrantInfo
+from .cache import RESULTS_CACHE, VERSION_CACHE, VERSION_KEY, bump_dataset_version
+from .models import PracticeLocation, ScraperResult
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .persistence import decode_json_fields, upsert_results
+from .tasks import aggregate_shards
 
-# Create your tests here.
+# The results cache and its version in this process' memory instead of Redis
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    RESULTS_CACHE: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-results'},
+    VERSION_CACHE: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-version',
+                    'TIMEOUT': None},
+}
+
+def registrant(userid, name=None, **fields):
+    return RegistrantInfo(name=name or f"Registrant {userid}", userid=str(userid),
+                          url=f"https://example.com/?UserID={userid}", **fields)
+
+class UpsertResultsTests(TestCase):
+    def test_updates_existing_rows_by_userid(self):
+        self.assertEqual(upsert_results([registrant(1), registrant(2)]), 2)
+        self.assertEqual(upsert_results([registrant(2, name="Renamed"), registrant(3)]), 2)
+
+        self.assertEqual(ScraperResult.objects.count(), 3)
+        self.assertEqual(ScraperResult.objects.get(userid="2").name, "Renamed")
+
+    def test_last_result_for_a_userid_in_a_batch_wins(self):
+        self.assertEqual(upsert_results([registrant(1, name="First"), registrant(1, name="Second")]), 1)
+        self.assertEqual(list(ScraperResult.objects.values_list('name', flat=True)), ["Second"])
+
+    def test_batches_smaller_than_the_input(self):
+        self.assertEqual(upsert_results([registrant(i) for i in range(7)], batch_size=3), 7)
+        self.assertEqual(ScraperResult.objects.count(), 7)
+
+    def test_replaces_practice_locations(self):
+        upsert_results([registrant(1, practice_locations=[
+            {"Address": "1 Main St", "City": "Toronto", "Postal Code": "m5v 1a1"},
+            {"Address": "2 King St", "City": "Ottawa", "Postal Code": "K1P 1J1"},
+        ])])
+        upsert_results([registrant(1, practice_locations=[
+            {"Address": "3 Queen St", "City": "Hamilton", "Postal Code": "L8P 4R5"},
+        ])])
+
+        locations = list(PracticeLocation.objects.values('registrant__userid', 'city', 'postal_code'))
+        self.assertEqual(locations, [{'registrant__userid': "1", 'city': "Hamilton", 'postal_code': "L8P4R5"}])
+
+    def test_json_fields_round_trip(self):
+        history = [{"Status": "Registered", "Date": "2001-02-03"}]
+        upsert_results([registrant(1, registrant_history=history)])
+
+        row = decode_json_fields(ScraperResult.objects.filter(userid="1").values().get())
+        self.assertEqual(row['registrant_history'], history)
+        self.assertEqual(row['practice_locations'], [])
+
+@override_settings(CACHES=TEST_CACHES)
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        for alias in (RESULTS_CACHE, VERSION_CACHE):
+            caches[alias].clear()
+
+    def get_count(self):
+        response = self.client.get(reverse('results'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_responses_are_served_until_the_version_is_bumped(self):
+        upsert_results([registrant(1)])
+        self.assertEqual(self.get_count(), 1)
+
+        # Batches written during a crawl don't invalidate the cache
+        upsert_results([registrant(2)])
+        self.assertEqual(self.get_count(), 1)
+
+        bump_dataset_version()
+        self.assertEqual(self.get_count(), 2)
+
+    def test_bump_starts_past_the_implicit_first_version(self):
+        bump_dataset_version()
+        self.assertEqual(caches[VERSION_CACHE].get(VERSION_KEY), 2)
+        bump_dataset_version()
+        self.assertEqual(caches[VERSION_CACHE].get(VERSION_KEY), 3)
+
+    def test_finished_sharded_crawl_bumps_the_version(self):
+        caches[VERSION_CACHE].set(VERSION_KEY, 5)
+        summary = aggregate_shards([{"user_ids": 2, "written": 2}, {"user_ids": 1, "written": 1}], discovered=3)
+        self.assertEqual(summary['written'], 3)
+        self.assertEqual(caches[VERSION_CACHE].get(VERSION_KEY), 6)
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_results([registrant(i) for i in range(25)])
+        cls.ids = list(ScraperResult.objects.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        for alias in (RESULTS_CACHE, VERSION_CACHE):
+            caches[alias].clear()
+
+    def get_page(self, cursor='', **params):
+        response = self.client.get(reverse('results'), {'cursor': cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor({'rank': 0.3, 'id': 17}, backwards=True)
+        self.assertEqual(decode_cursor(cursor), ({'rank': 0.3, 'id': 17}, True))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not a cursor")
+
+    def test_pages_forward_and_back(self):
+        pages = [self.get_page(per_page=10)]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.get_page(pages[-1]['next'], per_page=10))
+        self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+        self.assertEqual([row['id'] for page in pages for row in page['results']], self.ids)
+
+        backwards = [pages[-1]]
+        while backwards[-1]['previous']:
+            backwards.append(self.get_page(backwards[-1]['previous'], per_page=10))
+        self.assertEqual([row['id'] for page in reversed(backwards) for row in page['results']], self.ids)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('results'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_from_another_query(self):
+        cursor = encode_cursor({'name': 'x', 'id': 1})
+        response = self.client.get(reverse('results'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_exact_count(self):
+        self.assertEqual(self.get_page(per_page=10, count='exact')['count'], 25)
+
+@override_settings(CACHES=TEST_CACHES)
+class RankedPaginationTests(TestCase):
+    # Search results are ordered by trigram rank; names of the same shape tie exactly and names
+    # that differ by a letter or two rank close together. A cursor's rank has to compare equal to
+    # the row it came from, or rows tied with a page's last row are skipped or repeated
+    @classmethod
+    def setUpTestData(cls):
+        names = [f"Jane Smith {i:02d}" for i in range(9)]
+        names += ["Smith" + "e" * length for length in range(1, 8)]
+        names += [f"Smithson {suffix}" for suffix in ("Ann", "Bob", "Cy", "Dee", "Ed")]
+        upsert_results([registrant(i, name=name) for i, name in enumerate(names)])
+
+    def setUp(self):
+        for alias in (RESULTS_CACHE, VERSION_CACHE):
+            caches[alias].clear()
+
+    def get(self, **params):
+        response = self.client.get(reverse('results'), {'query': 'smith', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_match_the_ranked_order(self):
+        expected = [row['userid'] for row in self.get(per_page=100)['results']]
+        self.assertEqual(len(expected), 21)
+
+        pages = [self.get(cursor='', per_page=4)]
+        while pages[-1]['next']:
+            pages.append(self.get(cursor=pages[-1]['next'], per_page=4))
+        forwards = [row['userid'] for page in pages for row in page['results']]
+        self.assertEqual(forwards, expected)
+
+        backwards = [pages[-1]]
+        while backwards[-1]['previous']:
+            backwards.append(self.get(cursor=backwards[-1]['previous'], per_page=4))
+        self.assertEqual([row['userid'] for page in reversed(backwards) for row in page['results']], expected)
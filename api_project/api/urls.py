@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import ScrapeView, TaskStatusView, ResultsView
+from .views import ScrapeView, TaskStatusView, TaskProgressStreamView, ResultsView, ResultsExportView, ResultDetailView, MetricsView
 
 urlpatterns = [
     path('scrape/', ScrapeView.as_view(), name='scrape'),
     path('task-status/<str:task_id>/', TaskStatusView.as_view(), name='task_status'),
+    path('task-status/<str:task_id>/stream/', TaskProgressStreamView.as_view(), name='task_status_stream'),
     path('results/', ResultsView.as_view(), name='results'),
+    path('results/export/', ResultsExportView.as_view(), name='results_export'),
+    path('results/<str:userid>/', ResultDetailView.as_view(), name='result_detail'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
@@ -1,49 +1,177 @@
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
-from .tasks import execute_scraper
+import json
+import math
+from .tasks import crawl_registry, execute_scraper
 from .models import ScraperResult
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import Q
-from celery.result import AsyncResult
-
-class ScrapeView(APIView):
-    def post(self, request):
-        task = execute_scraper.delay()
-        return Response({"task_id": str(task.id)}, status=status.HTTP_202_ACCEPTED)
-
-class TaskStatusView(APIView):
-    def get(self, request, task_id):
-        task = AsyncResult(task_id)
-        if task.failed():
-            error_info = str(task.result)  # Convert the error to a string
-            return Response({
-                "status": task.status,
-                "error": error_info
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return Response({
-            "status": task.status,
-            "result": task.result if task.ready() else None
+from .search import search_results
+from .locations import filter_by_location
+from .pagination import InvalidCursor, KeysetPaginator, estimate_count
+from .export import EXPORT_FORMATS, export_csv, export_ndjson
+from .cache import cached_response
+from .progress import get_progress, progress_events
+from .metrics import render_metrics
+from .persistence import MODEL_FIELDS, decode_json_fields
+from asgiref.sync import sync_to_async
+from celery import states
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django_celery_results.models import TaskResult
+from scraper.public_registry.checkpoint import is_valid_crawl_id
+
+# The views are plain async Django views (DRF's APIView can't run async handlers), so under
+# uvicorn they run on the event loop and await the async ORM instead of holding a worker thread
+
+def request_data(request) -> dict:
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST.dict()
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ScrapeView(View):
+    async def post(self, request):
+        data = request_data(request)
+        # Pass the crawl_id of an interrupted crawl to resume it instead of starting over
+        crawl_id = data.get('crawl_id')
+        if crawl_id is not None and not is_valid_crawl_id(str(crawl_id)):
+            return JsonResponse({"error": "Invalid crawl_id"}, status=400)
+        # Sharded by default: the search runs in one task and registrants are scraped in
+        # chunks across all workers; "sharded": false runs the whole crawl in a single task
+        if data.get('sharded', True) in (False, 'false', '0', 0):
+            task = await sync_to_async(execute_scraper.delay)(crawl_id=crawl_id)
+        else:
+            task = await sync_to_async(crawl_registry.delay)(crawl_id=crawl_id)
+        return JsonResponse({
+            "task_id": str(task.id),
+            "crawl_id": crawl_id or str(task.id),
+        }, status=202)
+
+class TaskStatusView(View):
+    async def get(self, request, task_id):
+        # Read the django-db result backend's row directly instead of through AsyncResult,
+        # whose lookups are blocking
+        task = await TaskResult.objects.filter(task_id=task_id).values('status', 'result').afirst()
+        # Live counters published by the crawl; task-status/<id>/stream/ pushes them instead
+        progress = await get_progress(task_id)
+        if task is None:
+            # Celery doesn't store anything until a task starts or finishes
+            return JsonResponse({"status": states.PENDING, "result": None, "progress": progress})
+        result = json.loads(task['result']) if task['result'] else None
+        if task['status'] == states.FAILURE:
+            error_info = result.get('exc_message') if isinstance(result, dict) else result
+            if isinstance(error_info, list):
+                error_info = ' '.join(str(part) for part in error_info)
+            return JsonResponse({
+                "status": task['status'],
+                "error": str(error_info)
+            }, status=500)
+        return JsonResponse({
+            "status": task['status'],
+            "result": result if task['status'] in states.READY_STATES else None,
+            "progress": progress,
         })
 
-class ResultsView(APIView):
-    def get(self, request):
+class TaskProgressStreamView(View):
+    async def get(self, request, task_id):
+        # One connection per client, fed from Redis pub/sub rather than DB polls. It is closed
+        # every few minutes and EventSource reconnects, so clients that left are let go
+        response = StreamingHttpResponse(progress_events(task_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+# The list returns this compact summary unless ?fields= asks for other columns (or "all");
+# the full record, JSON columns included, is at results/<userid>/
+LIST_FIELDS = ['id', 'userid', 'name', 'registration_number', 'registration_status', 'registrant_type']
+
+def parse_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return LIST_FIELDS
+    if fields == 'all':
+        return MODEL_FIELDS
+    fields = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in MODEL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+class ResultsView(View):
+    # Identical queries are served from the cache until the next crawl finishes writing
+    @cached_response
+    async def get(self, request):
         query = request.GET.get('query', '')
-        page = int(request.GET.get('page', 1))
-        per_page = int(request.GET.get('per_page', 10))
+        page = request.GET.get('page', 1)
+        per_page = max(int(request.GET.get('per_page', 10)), 1)
+        try:
+            fields = parse_fields(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # ?city= and ?postal_prefix= match registrants' normalized practice locations
+        results = filter_by_location(ScraperResult.objects.all(), request.GET.get('city'),
+                                     request.GET.get('postal_prefix'))
+        results = await search_results(results, query)
 
-        results = ScraperResult.objects.filter(
-            Q(name__icontains=query) | 
-            Q(userid__icontains=query) |
-            Q(registration_number__icontains=query)
-        )
+        # ?cursor= (empty for the first page) switches to keyset pagination: no COUNT(*) and
+        # no OFFSET, so every page costs the same; ?count=approx adds the planner's estimate
+        if 'cursor' in request.GET:
+            try:
+                page_data = await KeysetPaginator(results, per_page, fields=fields).page(request.GET.get('cursor') or None)
+            except InvalidCursor as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            count = request.GET.get('count')
+            if count == 'approx':
+                page_data['count'] = await estimate_count(results)
+            elif count == 'exact':
+                page_data['count'] = await results.acount()
+            return JsonResponse(page_data)
 
-        paginator = Paginator(results, per_page)
-        page_obj = paginator.get_page(page)
+        # Same page clamping as Paginator.get_page()
+        count = await results.acount()
+        num_pages = max(math.ceil(count / per_page), 1)
+        try:
+            page = min(max(int(page), 1), num_pages)
+        except ValueError:
+            page = 1
+        offset = (page - 1) * per_page
 
         return JsonResponse({
-            'count': paginator.count,
-            'num_pages': paginator.num_pages,
-            'results': list(page_obj.object_list.values()),
-        })
\ No newline at end of file
+            'count': count,
+            'num_pages': num_pages,
+            # Only the requested columns are selected
+            'results': [row async for row in results.values(*fields)[offset:offset + per_page]],
+        })
+
+class ResultDetailView(View):
+    @cached_response
+    async def get(self, request, userid):
+        result = await ScraperResult.objects.filter(userid=userid).values(*MODEL_FIELDS).afirst()
+        if result is None:
+            return JsonResponse({'error': 'Result not found'}, status=404)
+        return JsonResponse(decode_json_fields(result))
+
+class ResultsExportView(View):
+    async def get(self, request):
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+        results = filter_by_location(ScraperResult.objects.all(), request.GET.get('city'),
+                                     request.GET.get('postal_prefix'))
+        results = await search_results(results, request.GET.get('query', ''))
+
+        # Streamed from an async iterator so the ASGI server sends each chunk as it is read
+        if export_format == 'csv':
+            response = StreamingHttpResponse(export_csv(results), content_type='text/csv; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(export_ndjson(results), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="results.{export_format}"'
+        return response
+
+class MetricsView(View):
+    async def get(self, request):
+        return HttpResponse(await render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
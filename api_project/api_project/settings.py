@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'api',
     'django_celery_results',
@@ -102,4 +103,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Celery settings
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379')
-CELERY_RESULT_BACKEND = 'django-db'
\ No newline at end of file
+CELERY_RESULT_BACKEND = 'django-db'
+
+# Cache for /api/results/ responses. Entries are keyed on a dataset version that every finished
+# crawl bumps, so they never go stale for longer than RESULTS_CACHE_TIMEOUT. The version is one
+# small key in a Redis shared by the Celery workers and every web process (RESULTS_CACHE_URL,
+# else the broker). The responses themselves go to a per-process LRU of RESULTS_CACHE_MAX_ENTRIES,
+# or with RESULTS_CACHE_URL to that Redis, which should run with maxmemory-policy allkeys-lru.
+RESULTS_CACHE_URL = config('RESULTS_CACHE_URL', default='')
+RESULTS_CACHE_TIMEOUT = config('RESULTS_CACHE_TIMEOUT', default=600, cast=int)
+RESULTS_CACHE_MAX_ENTRIES = config('RESULTS_CACHE_MAX_ENTRIES', default=1000, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'results': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': RESULTS_CACHE_URL,
+        'KEY_PREFIX': 'results',
+        'TIMEOUT': RESULTS_CACHE_TIMEOUT,
+    } if RESULTS_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'results',
+        'TIMEOUT': RESULTS_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': RESULTS_CACHE_MAX_ENTRIES},
+    },
+    'results_version': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': RESULTS_CACHE_URL or CELERY_BROKER_URL,
+        'KEY_PREFIX': 'results',
+        'TIMEOUT': None,
+    },
+}
+
+# Scraper settings
+# "redis" shares one request budget across every Celery worker (via CELERY_BROKER_URL),
+# "local" limits each crawl process on its own and "memory" is an in-process stand-in for "redis"
+SCRAPER_RATE_LIMIT_BACKEND = config('SCRAPER_RATE_LIMIT_BACKEND', default='redis')
+SCRAPER_RATE_LIMIT = config('SCRAPER_RATE_LIMIT', default=2, cast=float)
+SCRAPER_RATE_LIMIT_KEY = config('SCRAPER_RATE_LIMIT_KEY', default='scraper:rate_limiter')
+# Sharded crawls scrape SCRAPER_SHARD_SIZE registrants per task with SCRAPER_SHARD_WORKERS workers each
+SCRAPER_SHARD_SIZE = config('SCRAPER_SHARD_SIZE', default=500, cast=int)
+SCRAPER_SHARD_WORKERS = config('SCRAPER_SHARD_WORKERS', default=5, cast=int)
+# Crawls keep every fetched page in the page archive (directory from SCRAPER_ARCHIVE_DIR)
+SCRAPER_ARCHIVE = config('SCRAPER_ARCHIVE', default=True, cast=bool)
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = "page_archive"
+# WAL journaling; the queries below avoid upserts and window functions (3.24+/3.25+),
+# since Amazon Linux 2's system Python links SQLite 3.7.17
+MIN_SQLITE_VERSION = (3, 7, 0)
+PAGE_KINDS = ("registrant", "search")
+
+# ASP.NET hidden state (__VIEWSTATE, __EVENTVALIDATION, ...) can differ between fetches of an
+# otherwise unchanged page; it is left out of the content hash so such pages still dedupe
+VOLATILE_FIELD_PATTERN = re.compile(rb'(<input[^>]*\bname="__[A-Za-z]+"[^>]*\bvalue=")[^"]*(")', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    page_key TEXT NOT NULL,
+    crawl_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+    fetched_at REAL NOT NULL,
+    UNIQUE (kind, page_key, crawl_id, sha256)
+);
+CREATE INDEX IF NOT EXISTS pages_key ON pages (kind, page_key);
+CREATE INDEX IF NOT EXISTS pages_crawl ON pages (crawl_id, kind);
+"""
+
+def content_hash(html: bytes) -> str:
+    return hashlib.sha256(VOLATILE_FIELD_PATTERN.sub(rb"\1\2", html)).hexdigest()
+
+def blob_path(directory, sha256: str) -> Path:
+    return Path(directory) / "objects" / sha256[:2] / f"{sha256}.html.gz"
+
+def read_page(directory, sha256: str) -> str:
+    """A page's HTML straight from the blob store, without opening the index (e.g. in another process)."""
+    return gzip.decompress(blob_path(directory, sha256).read_bytes()).decode('utf-8')
+
+@dataclass
+class ArchivedPage:
+    kind: str
+    key: str
+    crawl_id: str
+    url: str
+    sha256: str
+    fetched_at: float
+
+class PageArchive:
+    # Raw pages as fetched, so they can be parsed again without re-crawling. Each distinct page
+    # is stored once, gzipped, at objects/<hash[:2]>/<hash>.html.gz; a SQLite index records
+    # which crawl fetched which page (a registrant's user id, or a search page) and when.
+    # A page fetched again unchanged only adds an index row.
+    def __init__(self, directory: Optional[str] = None, compresslevel: int = 6):
+        self.directory = Path(directory or os.environ.get("SCRAPER_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR))
+        (self.directory / "objects").mkdir(parents=True, exist_ok=True)
+        self.compresslevel = compresslevel
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(f"The page archive needs SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or later, "
+                               f"found {sqlite3.sqlite_version}")
+        # Pages are stored from worker threads; one connection, used under the lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.directory / "index.sqlite3", timeout=30, check_same_thread=False)
+        # WAL lets several crawls on the same host share the archive
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.stored = 0
+        self.deduplicated = 0
+        self.errors = 0
+
+    def put(self, kind: str, key: str, html: str, url: str = "", crawl_id: Optional[str] = None) -> str:
+        """Archive a fetched page; returns its content hash."""
+        if kind not in PAGE_KINDS:
+            raise ValueError(f"Unknown page kind: {kind}")
+        data = html.encode('utf-8')
+        sha256 = content_hash(data)
+        path = blob_path(self.directory, sha256)
+        is_new = not path.exists()
+        if is_new:
+            compressed = gzip.compress(data, self.compresslevel)
+            path.parent.mkdir(exist_ok=True)
+            # Written under a temporary name and renamed, so a blob is either complete or absent
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(compressed)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock, self._db:
+            if is_new:
+                self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                                 (sha256, len(data), len(compressed), now))
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO pages (kind, page_key, crawl_id, url, sha256, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (kind, key, crawl_id or "", url, sha256, now)).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE pages SET fetched_at = ? WHERE kind = ? AND page_key = ? AND crawl_id = ? AND sha256 = ?",
+                    (now, kind, key, crawl_id or "", sha256))
+        if is_new:
+            self.stored += 1
+        else:
+            self.deduplicated += 1
+        return sha256
+
+    async def store(self, kind: str, key: str, html: str, url: str = "",
+                    crawl_id: Optional[str] = None) -> Optional[str]:
+        """put() off the event loop; a failure is logged rather than failing the crawl."""
+        try:
+            # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.put, kind, key, html, url=url, crawl_id=crawl_id))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error archiving {kind} page {key}: {str(e)}")
+            return None
+
+    def get(self, sha256: str) -> str:
+        return read_page(self.directory, sha256)
+
+    def pages(self, kind: str = "registrant", crawl_id: Optional[str] = None) -> Iterator[ArchivedPage]:
+        """The most recently fetched version of each page, optionally only pages from crawl_id."""
+        conditions, params = ["kind = ?"], [kind]
+        if crawl_id is not None:
+            conditions.append("crawl_id = ?")
+            params.append(crawl_id)
+        where = " AND ".join(conditions)
+        # Latest fetch per page_key; MAX(id) breaks ties between rows fetched at the same time
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT kind, page_key, crawl_id, url, sha256, fetched_at FROM pages WHERE id IN ("
+                f"SELECT MAX(pages.id) FROM pages JOIN ("
+                f"SELECT page_key, MAX(fetched_at) AS latest FROM pages WHERE {where} GROUP BY page_key"
+                f") AS newest ON pages.page_key = newest.page_key AND pages.fetched_at = newest.latest "
+                f"WHERE {' AND '.join('pages.' + condition for condition in conditions)} GROUP BY pages.page_key"
+                f") ORDER BY page_key", params * 2).fetchall()
+        for row in rows:
+            yield ArchivedPage(*row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()
+            blobs, size, stored_size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+        return {"pages": pages, "blobs": blobs, "size": size, "stored_size": stored_size,
+                "stored": self.stored, "deduplicated": self.deduplicated, "errors": self.errors}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+logger = logging.getLogger(__name__)
+
+# Browsers may be started concurrently; only one thread should download/install chromedriver
+_install_lock = threading.Lock()
+
+def create_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument('--log-level=3')  # Only show fatal errors
+    with _install_lock:
+        driver_path = ChromeDriverManager().install()
+    service = Service(driver_path)
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+class Browser:
+    # WebDriver calls block and drivers are not thread-safe, so each browser gets
+    # exactly one dedicated thread and every call for it is run there
+    def __init__(self):
+        self.driver = None
+        self.pages_served = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="webdriver")
+
+    async def start(self) -> "Browser":
+        if self.driver is None:
+            try:
+                self.driver = await self.run(create_driver)
+            except Exception:
+                self._executor.shutdown(wait=False)
+                raise
+        return self
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def is_alive(self, timeout: float = 10.0) -> bool:
+        if self.driver is None:
+            return False
+        try:
+            await asyncio.wait_for(self.run(self.driver.execute_script, "return 1"), timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"WebDriver liveness probe failed: {str(e)}")
+            return False
+
+    async def quit(self, timeout: float = 30.0):
+        try:
+            if self.driver is not None:
+                await asyncio.wait_for(self.run(self.driver.quit), timeout)
+        except Exception as e:
+            logger.error(f"Error closing WebDriver: {str(e)}")
+        finally:
+            self.driver = None
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import re
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from .registrant_scraper import RegistrantInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = "crawl_checkpoints"
+# Crawl ids become file names, so only allow plain identifiers (task UUIDs included)
+CRAWL_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,127}")
+
+def is_valid_crawl_id(crawl_id: str) -> bool:
+    return bool(CRAWL_ID_PATTERN.fullmatch(crawl_id))
+
+class CrawlCheckpoint:
+    # Crawl state is an append-only JSON lines journal, fsynced per event and replayed
+    # on load, so a crawl killed at any point resumes from its last recorded event.
+    # Once the crawl finishes the journal is compacted down to its ids.
+    def __init__(self, crawl_id: str, directory: Optional[str] = None):
+        if not is_valid_crawl_id(crawl_id):
+            raise ValueError(f"Invalid crawl id: {crawl_id!r}")
+        directory = directory or os.environ.get("SCRAPER_CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)
+        self.crawl_id = crawl_id
+        self.path = Path(directory) / f"{crawl_id}.jsonl"
+        self.total_pages: Optional[int] = None
+        self.page_size: Optional[int] = None
+        self.completed_pages: Set[int] = set()
+        self.discovered: Dict[str, None] = {}  # ordered set of user ids
+        # Only ids are kept in memory; results are streamed back from the journal on resume
+        self.scraped: Set[str] = set()
+        # Scraped ids whose results are known to be stored by a durable writer
+        self.written: Set[str] = set()
+        self.finished = False
+
+    def load(self) -> "CrawlCheckpoint":
+        for event in self._read_events():
+            self._apply(event)
+        logger.info(f"Loaded checkpoint for crawl {self.crawl_id}: {len(self.completed_pages)} pages, "
+                    f"{len(self.discovered)} discovered, {len(self.scraped)} scraped")
+        return self
+
+    def _read_events(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash mid-write
+                    logger.warning(f"Skipping unreadable checkpoint line {line_number} in {self.path}")
+
+    def _apply(self, event: dict):
+        kind = event.get("event")
+        if kind == "total_pages":
+            page_size = event.get("page_size")
+            if page_size != self.page_size:
+                # Page numbers only mean something for the page size they were crawled with
+                self.completed_pages.clear()
+            self.total_pages = event["total_pages"]
+            self.page_size = page_size
+        elif kind == "page":
+            self.completed_pages.add(event["page"])
+            for user_id in event["user_ids"]:
+                self.discovered[user_id] = None
+        elif kind == "scraped":
+            self.scraped.add(event["result"]["userid"])
+        elif kind == "written":
+            self.scraped.update(event["user_ids"])
+            self.written.update(event["user_ids"])
+        elif kind == "finished":
+            self.finished = True
+
+    @property
+    def search_completed(self) -> bool:
+        return self.total_pages is not None and len(self.completed_pages) >= self.total_pages
+
+    def is_discovered(self, user_id: str) -> bool:
+        return user_id in self.discovered
+
+    def pending_user_ids(self) -> List[str]:
+        return [user_id for user_id in self.discovered if user_id not in self.scraped]
+
+    def iter_unwritten_results(self) -> Iterator[RegistrantInfo]:
+        """Scraped results not recorded as written, e.g. still in the sink when the crawl died."""
+        for event in self._read_events():
+            if event.get("event") == "scraped" and event["result"]["userid"] not in self.written:
+                yield RegistrantInfo(**event["result"])
+
+    def record_total_pages(self, total_pages: int, page_size: Optional[int] = None):
+        self._record({"event": "total_pages", "total_pages": total_pages, "page_size": page_size})
+
+    def record_page(self, page: int, user_ids: Iterable[str]):
+        self._record({"event": "page", "page": page, "user_ids": list(user_ids)})
+
+    def record_scraped(self, info: RegistrantInfo):
+        self._record({"event": "scraped", "result": asdict(info)})
+
+    def record_written(self, user_ids: Iterable[str]):
+        """Ids whose results are stored, so a resumed crawl neither scrapes nor writes them again."""
+        self._record({"event": "written", "user_ids": list(user_ids)})
+
+    def record_finished(self):
+        self._record({"event": "finished"})
+        self._compact()
+
+    def _compact(self):
+        # A finished crawl is never resumed, so the scraped results, the bulk of the journal, are
+        # dropped: search events are kept as they are and every scraped id is recorded as written
+        events = [event for event in self._read_events() if event.get("event") in ("total_pages", "page")]
+        events += [{"event": "written", "user_ids": sorted(self.scraped)}, {"event": "finished"}]
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Error compacting checkpoint {self.path}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+
+    def _record(self, event: dict):
+        self._apply(event)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One write() on an O_APPEND descriptor, so events appended concurrently by the
+        # shards of a sharded crawl don't interleave
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from .browser import Browser
+
+logger = logging.getLogger(__name__)
+
+class DriverPool:
+    def __init__(self, max_size: int = 5, min_size: int = 0, max_pages: int = 200,
+                 probe_timeout: float = 10.0):
+        if min_size > max_size:
+            raise ValueError("min_size cannot be greater than max_size")
+        self.max_size = max_size
+        self.min_size = min_size
+        # Browsers are recycled after this many pages to shed Chrome's memory growth
+        self.max_pages = max_pages
+        self.probe_timeout = probe_timeout
+        self._idle = deque()
+        self._size = 0  # idle + checked out browsers
+        self._condition = asyncio.Condition()
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def start(self):
+        # Warm up min_size browsers concurrently, each on its own WebDriver thread
+        async with self._condition:
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        results = await asyncio.gather(*(Browser().start() for _ in range(missing)), return_exceptions=True)
+        async with self._condition:
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error warming up WebDriver: {str(result)}")
+                    self._size -= 1
+                else:
+                    self._idle.append(result)
+            self._condition.notify_all()
+        logger.info(f"Driver pool warmed up with {len(self._idle)} browsers")
+
+    async def acquire(self) -> Browser:
+        while True:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is closed")
+                    if self._idle:
+                        browser = self._idle.popleft()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        browser = None
+                        break
+                    await self._condition.wait()
+
+            if browser is None:
+                try:
+                    return await Browser().start()
+                except Exception:
+                    await self._forget()
+                    raise
+
+            if await browser.is_alive(self.probe_timeout):
+                return browser
+            logger.warning("Discarding unresponsive WebDriver from pool")
+            await self._discard(browser)
+
+    async def release(self, browser: Browser, failed: bool = False):
+        if failed or self._closed or browser.pages_served >= self.max_pages:
+            reason = "crash" if failed else "pool closed" if self._closed else f"{browser.pages_served} pages"
+            logger.info(f"Recycling WebDriver after {reason}")
+            await self._discard(browser)
+            return
+        async with self._condition:
+            self._idle.append(browser)
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def checkout(self):
+        browser = await self.acquire()
+        try:
+            yield browser
+        except Exception:
+            await self.release(browser, failed=True)
+            raise
+        await self.release(browser)
+
+    async def _discard(self, browser: Browser):
+        await browser.quit()
+        await self._forget()
+
+    async def _forget(self):
+        async with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    async def close(self):
+        async with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        await asyncio.gather(*(browser.quit() for browser in idle))
@@ -0,0 +1,53 @@
+import logging
+from typing import Dict, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-CA,en;q=0.9",
+}
+
+class HttpFetcher:
+    # One instance is shared by all workers so keep-alive connections are reused
+    def __init__(self, limit: int = 10, timeout: float = 30.0, keepalive_timeout: float = 60.0,
+                 headers: Optional[Dict[str, str]] = None):
+        self.limit = limit
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def fetch(self, url: str) -> str:
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def post(self, url: str, data) -> str:
+        async with self.session.post(url, data=data) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def close(self):
+        try:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+        except Exception as e:
+            logger.error(f"Error closing HTTP session: {str(e)}")
@@ -1,12 +1,25 @@
+import argparse
 import asyncio
 import logging
+import os
 import sys
 import signal
 import psutil
-from typing import List
+from typing import List, Optional
 from .search_scraper import SearchScraper
 from .registrant_scraper import RegistrantInfoScraper, RegistrantInfo
-from .rate_limiter import RateLimiter
+from .rate_limiter import RATE_LIMIT_BACKENDS, RateLimiter, create_rate_limiter
+from .fetchers import HttpFetcher
+from .driver_pool import DriverPool
+from .checkpoint import CrawlCheckpoint
+from .archive import PageArchive
+from .waits import WaitStats
+from .sink import ResultSink, BatchWriter
+from .output import NdjsonWriter
+from .parsers import DEFAULT_PARSER, PARSER_ENGINES
+from .progress import ProgressTracker
+from .metrics import REGISTRANTS, REGISTRY, log_summary
+from .work_queue import DEFAULT_MAX_SIZE, RESUME_PRIORITY, WorkQueue
 import json
 from dataclasses import asdict
 
@@ -20,9 +33,17 @@ def signal_handler(signum, frame):
     logger.info("Interrupt received, stopping scraper...")
     stop_flag.set()
 
-async def registrant_worker(queue: asyncio.Queue, results: List[RegistrantInfo], 
-                            rate_limiter: RateLimiter, worker_id: int):
-    scraper = RegistrantInfoScraper()
+async def registrant_worker(queue: WorkQueue, sink: ResultSink, 
+                            rate_limiter: RateLimiter, worker_id: int,
+                            engine: str = "http", http_fetcher: Optional[HttpFetcher] = None,
+                            wait_stats: Optional[WaitStats] = None, driver_pool: Optional[DriverPool] = None,
+                            checkpoint: Optional[CrawlCheckpoint] = None, parser: str = DEFAULT_PARSER,
+                            progress: Optional[ProgressTracker] = None, archive: Optional[PageArchive] = None,
+                            crawl_id: Optional[str] = None):
+    progress = progress or ProgressTracker()
+    scraper = RegistrantInfoScraper(engine=engine, http_fetcher=http_fetcher, wait_stats=wait_stats,
+                                    driver_pool=driver_pool, parser=parser, archive=archive, crawl_id=crawl_id,
+                                    rate_limiter=rate_limiter)
     try:
         while True:
             try:
@@ -34,9 +55,25 @@ async def registrant_worker(queue: asyncio.Queue, results: List[RegistrantInfo],
                 await rate_limiter.acquire()
                 try:
                     info = await scraper.scrape(user_id)
-                    results.append(info)
-                    logger.info(f"Worker {worker_id}: Scraped info for URL: {info.url}")
+                    ok = not info.name.startswith("Error: ")
+                    # Only the registry's response time, not the browser's render wait, is feedback
+                    if scraper.last_latency is not None:
+                        rate_limiter.record(scraper.last_latency, ok=ok, status=scraper.last_status)
+                    progress.add("scraped" if ok else "failed")
+                    REGISTRANTS.inc(outcome="ok" if ok else "error")
+                    progress.set("rate", round(rate_limiter.current_rate, 2))
+                    if ok:
+                        await sink.put(info)
+                        if checkpoint is not None:
+                            checkpoint.record_scraped(info)
+                        logger.info(f"Worker {worker_id}: Scraped info for URL: {info.url}")
+                    else:
+                        # Writes are upserts, so an error result would overwrite the registrant's
+                        # stored row; it is dropped, and left out of the checkpoint so a resume retries it
+                        logger.warning(f"Worker {worker_id}: Not writing failed result for URL: {info.url}")
                 except Exception as e:
+                    progress.add("failed")
+                    REGISTRANTS.inc(outcome="error")
                     logger.error(f"Worker {worker_id}: Error scraping user_id {user_id}: {str(e)}")
                 finally:
                     queue.task_done()
@@ -48,64 +85,269 @@ async def registrant_worker(queue: asyncio.Queue, results: List[RegistrantInfo],
         await scraper.close()
         logger.info(f"Worker {worker_id}: Shutting down")
 
-async def main():
-    queue = asyncio.Queue()
-    search_scraper = SearchScraper(queue, stop_flag)
+def start_workers(queue: WorkQueue, sink: ResultSink, rate_limiter: RateLimiter, num_workers: int,
+                  **worker_kwargs) -> List[asyncio.Task]:
+    return [asyncio.create_task(registrant_worker(queue, sink, rate_limiter, i, **worker_kwargs))
+            for i in range(num_workers)]
+
+async def finish_workers(queue: WorkQueue, worker_tasks: List[asyncio.Task]):
+    # Wait for all items in the queue to be processed
+    logger.info("Waiting for all items in the queue to be processed...")
+    await queue.join()
+
+    # Signal all workers to exit
+    logger.info("Signaling workers to exit...")
+    for _ in worker_tasks:
+        await queue.put(None)
+
+    # Wait for all worker tasks to complete
+    logger.info("Waiting for all worker tasks to complete...")
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+
+def resume_progress(progress: ProgressTracker, checkpoint: CrawlCheckpoint):
+    # A resumed crawl reports what its earlier runs already did
+    progress.set("pages_total", checkpoint.total_pages or 0)
+    progress.add("pages_done", len(checkpoint.completed_pages))
+    progress.add("discovered", len(checkpoint.discovered))
+    progress.add("scraped", len(checkpoint.scraped))
+
+async def main(engine: str = "http", num_workers: int = 5, crawl_id: Optional[str] = None,
+               write_batch: Optional[BatchWriter] = None, output: Optional[str] = None,
+               parser: str = DEFAULT_PARSER, search_engine: str = "postback",
+               rate_limiter: Optional[RateLimiter] = None, progress: Optional[ProgressTracker] = None,
+               queue_size: int = DEFAULT_MAX_SIZE, archive: Optional[PageArchive] = None) -> int:
+    # Metrics are per process; the end-of-run summary only covers what this run recorded
+    metrics_baseline = REGISTRY.snapshot()
+    # Bounded, so a fast search waits for the workers instead of building an unbounded backlog
+    queue = WorkQueue(queue_size)
+    checkpoint = CrawlCheckpoint(crawl_id).load() if crawl_id else None
+    progress = progress or ProgressTracker()
+    if checkpoint is not None and checkpoint.finished:
+        logger.info(f"Crawl {crawl_id} already finished with {len(checkpoint.scraped)} results")
+        resume_progress(progress, checkpoint)
+        progress.set("stage", "finished")
+        await progress.close()
+        return len(checkpoint.scraped)
+    # Shared by both stages so the end-of-run summary covers every readiness wait
+    wait_stats = WaitStats()
+    # One browser for the search session plus one per worker. Only browsers the selenium engines
+    # need up front are warmed up; the others start on the first page that falls back to Selenium
+    warm_browsers = (num_workers if engine == "selenium" else 0) + (1 if search_engine == "selenium" else 0)
+    driver_pool = DriverPool(max_size=num_workers + 1, min_size=warm_browsers)
+    # One pooled keep-alive session shared by the search pages and all registrant workers
+    http_fetcher = HttpFetcher(limit=num_workers + 4)
+    search_scraper = SearchScraper(queue, stop_flag, wait_stats=wait_stats, driver_pool=driver_pool,
+                                   checkpoint=checkpoint, parser=parser, engine=search_engine,
+                                   http_fetcher=http_fetcher, concurrency=4, progress=progress,
+                                   archive=archive, crawl_id=crawl_id)
+    # Results are streamed to write_batch as they are scraped; without one they are
+    # collected and saved to JSON at the end of the run
+    collected: List[RegistrantInfo] = []
+    # Written batches are checkpointed so a resume only re-sends results the sink never wrote;
+    # not for the in-memory list, which is lost with the run and needs every result again
+    record_written = (lambda batch: checkpoint.record_written(info.userid for info in batch)) \
+        if checkpoint is not None and write_batch is not None else None
+    sink = ResultSink(write_batch or collected.extend, on_written=record_written)
 
     try:
-        rate_limiter = RateLimiter(rate=2, per=1.0, burst=1)
+        await driver_pool.start()
+        sink.start()
+        # By default starts at the previous fixed 2 req/s and adapts to the registry's latency and errors
+        rate_limiter = rate_limiter or create_rate_limiter("local", rate=2)
+        progress.set("stage", "searching")
+        if checkpoint is not None:
+            resume_progress(progress, checkpoint)
+        progress.start()
+
+        if checkpoint is not None:
+            # Registrants an earlier run scraped are never queued again
+            queue.mark_seen(checkpoint.scraped)
+
+        # Workers start first so they can drain the bounded queue while it is being filled
+        worker_tasks = start_workers(queue, sink, rate_limiter, num_workers, engine=engine,
+                                     http_fetcher=http_fetcher, wait_stats=wait_stats,
+                                     driver_pool=driver_pool, checkpoint=checkpoint, parser=parser,
+                                     progress=progress, archive=archive, crawl_id=crawl_id)
 
         logger.info("Starting search scraper...")
         search_task = asyncio.create_task(search_scraper.scrape())
 
-        registrant_infos = []
-
-        num_workers = 5
-        worker_tasks = []
-        for i in range(num_workers):
-            task = asyncio.create_task(registrant_worker(queue, registrant_infos, rate_limiter, i))
-            worker_tasks.append(task)
+        if checkpoint is not None:
+            # Resume: re-queue what was discovered but not scraped, ahead of new ids, and re-send
+            # what was scraped but not written, e.g. still in the sink when the previous run died.
+            # Append-only writers such as NDJSON would duplicate anything sent twice.
+            pending = checkpoint.pending_user_ids()
+            logger.info(f"Resuming crawl {crawl_id}: {len(checkpoint.scraped)} already scraped, "
+                        f"{len(checkpoint.written)} written, {len(pending)} queued from checkpoint")
+            for user_id in pending:
+                if await queue.put(user_id, priority=RESUME_PRIORITY):
+                    progress.add("queued")
+            for info in checkpoint.iter_unwritten_results():
+                await sink.put(info)
 
         # Wait for search task to complete
         await search_task
         logger.info("Search task completed")
+        progress.set("stage", "scraping")
 
-        # Wait for all items in the queue to be processed
-        logger.info("Waiting for all items in the queue to be processed...")
-        await queue.join()
+        await finish_workers(queue, worker_tasks)
 
-        # Signal all workers to exit
-        logger.info("Signaling workers to exit...")
-        for _ in range(num_workers):
-            await queue.put(None)
+        # Flush the remaining results before the crawl can be marked finished
+        await sink.close()
+        logger.info(f"Scraping completed. Wrote info for {sink.written} registrants ({sink.failed} failed to write, "
+                    f"{queue.duplicates} duplicate ids skipped)")
+        # Results in a batch that failed to write are in the checkpoint as scraped but not written;
+        # leaving the crawl unfinished means resuming it re-sends them from the checkpoint
+        if sink.failed and checkpoint is not None:
+            logger.warning(f"{sink.failed} results failed to write; crawl {crawl_id} is left unfinished "
+                           f"so resuming it writes them again")
+        elif checkpoint is not None and checkpoint.search_completed and not checkpoint.pending_user_ids():
+            checkpoint.record_finished()
+        wait_stats.log_summary()
+        logger.info(f"Rate limiter: {rate_limiter.stats()}")
+        if archive is not None:
+            logger.info(f"Page archive: {archive.stats()}")
+        log_summary(metrics_baseline)
+        progress.set("stage", "finished")
+        logger.info(f"Progress: {progress.snapshot()}")
+        if write_batch is None:
+            save_results(collected, output or 'registrant_results.json')
+        
+        return sink.written
+    finally:
+        await sink.close()
+        await search_scraper.close()
+        await http_fetcher.close()
+        await driver_pool.close()
+        await progress.close()
 
-        # Wait for all worker tasks to complete
-        logger.info("Waiting for all worker tasks to complete...")
-        await asyncio.gather(*worker_tasks, return_exceptions=True)
+async def discover_user_ids(crawl_id: Optional[str] = None, parser: str = DEFAULT_PARSER,
+                           search_engine: str = "postback", progress: Optional[ProgressTracker] = None,
+                           archive: Optional[PageArchive] = None) -> List[str]:
+    """Run only the search stage, resuming crawl_id's checkpoint, and return the user ids found
+    that an earlier run of the crawl hasn't already written."""
+    metrics_baseline = REGISTRY.snapshot()
+    # Unbounded: nothing consumes it until the search is done
+    queue = WorkQueue(0)
+    checkpoint = CrawlCheckpoint(crawl_id).load() if crawl_id else None
+    progress = progress or ProgressTracker()
+    driver_pool = DriverPool(max_size=1, min_size=1 if search_engine == "selenium" else 0)
+    http_fetcher = HttpFetcher()
+    search_scraper = SearchScraper(queue, stop_flag, driver_pool=driver_pool, checkpoint=checkpoint,
+                                   parser=parser, engine=search_engine, http_fetcher=http_fetcher,
+                                   concurrency=4, progress=progress, archive=archive, crawl_id=crawl_id)
+    progress.set("stage", "searching")
+    if checkpoint is not None:
+        progress.set("pages_total", checkpoint.total_pages or 0)
+        progress.add("pages_done", len(checkpoint.completed_pages))
+        progress.add("discovered", len(checkpoint.discovered))
+    progress.start()
+    try:
+        await driver_pool.start()
+        await search_scraper.scrape()
 
-        logger.info(f"Scraping completed. Scraped info for {len(registrant_infos)} registrants")
-        save_results(registrant_infos)
-        
-        return registrant_infos
+        # Pages completed by an earlier run only left their ids in the checkpoint
+        user_ids = list(checkpoint.discovered) if checkpoint is not None else []
+        while not queue.empty():
+            user_ids.append(queue.get_nowait())
+        if queue.duplicates:
+            logger.info(f"Skipped {queue.duplicates} duplicate ids in search results")
+        if checkpoint is not None and not checkpoint.search_completed:
+            logger.warning(f"Search for crawl {crawl_id} did not complete; resume it to discover the rest")
+        user_ids = list(dict.fromkeys(user_ids))
+        logger.info(f"Discovered {len(user_ids)} registrants")
+        if checkpoint is not None and checkpoint.written:
+            # An earlier run recorded these once their results were stored. Ids only
+            # checkpointed as scraped may not have been written, so they stay.
+            pending = [user_id for user_id in user_ids if user_id not in checkpoint.written]
+            logger.info(f"{len(user_ids) - len(pending)} registrants already written by an earlier run "
+                        f"of crawl {crawl_id}")
+            progress.add("scraped", len(user_ids) - len(pending))
+            user_ids = pending
+        log_summary(metrics_baseline)
+        # Every id left goes to the shards, including those queued by an earlier run
+        progress.add("queued", len(user_ids) - progress.counters["queued"])
+        progress.set("stage", "scraping")
+        return user_ids
     finally:
         await search_scraper.close()
+        await http_fetcher.close()
+        await driver_pool.close()
+        await progress.close()
+
+async def scrape_user_ids(user_ids: List[str], engine: str = "http", num_workers: int = 5,
+                          write_batch: Optional[BatchWriter] = None, parser: str = DEFAULT_PARSER,
+                          rate_limiter: Optional[RateLimiter] = None,
+                          progress: Optional[ProgressTracker] = None, archive: Optional[PageArchive] = None,
+                          crawl_id: Optional[str] = None) -> int:
+    """Scrape one shard of a crawl's user ids and stream the results to write_batch; with crawl_id,
+    every written batch is recorded in the crawl's checkpoint so a resumed crawl skips it."""
+    metrics_baseline = REGISTRY.snapshot()
+    progress = progress or ProgressTracker()
+    # The whole shard is already in memory, so the queue only dedupes
+    queue = WorkQueue(0)
+    for user_id in user_ids:
+        queue.put_nowait(user_id)
+    wait_stats = WaitStats()
+    driver_pool = DriverPool(max_size=num_workers, min_size=num_workers if engine == "selenium" else 0)
+    http_fetcher = HttpFetcher(limit=num_workers + 4)
+    collected: List[RegistrantInfo] = []
+    # Shards run in parallel on any worker, so they only append to the checkpoint; ids are
+    # recorded after their batch was written, so a failed write is retried on resume
+    checkpoint = CrawlCheckpoint(crawl_id) if crawl_id else None
+    record_written = (lambda batch: checkpoint.record_written(info.userid for info in batch)) \
+        if checkpoint is not None else None
+    sink = ResultSink(write_batch or collected.extend, on_written=record_written)
+    rate_limiter = rate_limiter or create_rate_limiter("local", rate=2)
+
+    try:
+        await driver_pool.start()
+        sink.start()
+        progress.start()
+        worker_tasks = start_workers(queue, sink, rate_limiter, num_workers, engine=engine,
+                                     http_fetcher=http_fetcher, wait_stats=wait_stats,
+                                     driver_pool=driver_pool, parser=parser, progress=progress,
+                                     archive=archive, crawl_id=crawl_id)
+        await finish_workers(queue, worker_tasks)
+
+        await sink.close()
+        logger.info(f"Shard completed. Wrote info for {sink.written} of {len(user_ids)} registrants "
+                    f"({sink.failed} failed to write)")
+        wait_stats.log_summary()
+        logger.info(f"Rate limiter: {rate_limiter.stats()}")
+        if archive is not None:
+            logger.info(f"Page archive: {archive.stats()}")
+        log_summary(metrics_baseline)
+        return sink.written
+    finally:
+        await sink.close()
+        await http_fetcher.close()
+        await driver_pool.close()
+        await progress.close()
 
-def save_results(registrant_infos: List[RegistrantInfo]):
-    filename = 'registrant_results.json'
+def save_results(registrant_infos: List[RegistrantInfo], filename: str = 'registrant_results.json'):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump([asdict(info) for info in registrant_infos], f, ensure_ascii=False, indent=4)
     logger.info(f"Results saved to {filename}")
 
-async def run_scraper():
-    results = []
+async def run_scraper(engine: str = "http", num_workers: int = 5, crawl_id: Optional[str] = None,
+                      write_batch: Optional[BatchWriter] = None, output: Optional[str] = None,
+                      parser: str = DEFAULT_PARSER, search_engine: str = "postback",
+                      rate_limiter: Optional[RateLimiter] = None,
+                      progress: Optional[ProgressTracker] = None, queue_size: int = DEFAULT_MAX_SIZE,
+                      archive: Optional[PageArchive] = None) -> int:
+    written = 0
     try:
-        results = await main()  # Assuming main() returns the scraped results
+        written = await main(engine=engine, num_workers=num_workers, crawl_id=crawl_id,
+                             write_batch=write_batch, output=output, parser=parser,
+                             search_engine=search_engine, rate_limiter=rate_limiter, progress=progress,
+                             queue_size=queue_size, archive=archive)
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received, stopping scraper...")
     finally:
         logger.info("Shutting down...")
         cleanup_chrome_processes()
-    return results
+    return written
 
 
 def cleanup_chrome_processes():
@@ -117,7 +359,30 @@ def cleanup_chrome_processes():
                 pass
 
 
-def run_scraper_sync():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the public register")
+    parser.add_argument("--engine", choices=RegistrantInfoScraper.ENGINES, default="http")
+    parser.add_argument("--search-engine", choices=SearchScraper.ENGINES, default="postback")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_MAX_SIZE,
+                        help="Ids the search may queue ahead of the workers (0 for unbounded)")
+    parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER)
+    parser.add_argument("--crawl-id", help="Checkpoint under this id, resuming it if it exists")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json",
+                        help="ndjson appends one line per registrant as it is scraped")
+    parser.add_argument("--output", help="Output file (default registrant_results.json or .ndjson)")
+    parser.add_argument("--gzip", action="store_true", help="Gzip ndjson output")
+    parser.add_argument("--fsync", action="store_true", help="fsync ndjson output after every batch")
+    parser.add_argument("--rate-limit-backend", choices=RATE_LIMIT_BACKENDS, default="local",
+                        help="redis shares one request budget with every other crawl using --redis-url")
+    parser.add_argument("--rate", type=float, default=2, help="Requests per second to the registry")
+    parser.add_argument("--redis-url", default=os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379"))
+    parser.add_argument("--archive", action="store_true",
+                        help="Keep every fetched page in the page archive (SCRAPER_ARCHIVE_DIR, default page_archive)")
+    return parser.parse_args(argv)
+
+def run_scraper_sync(argv=None):
+    args = parse_args(argv)
     if sys.platform == 'win32':
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
@@ -125,8 +390,31 @@ def run_scraper_sync():
         loop = asyncio.get_event_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(sig, signal_handler, sig, None)
-    
-    asyncio.run(run_scraper())
+
+    writer = None
+    output = args.output
+    if args.format == "ndjson":
+        output = output or ('registrant_results.ndjson.gz' if args.gzip else 'registrant_results.ndjson')
+        writer = NdjsonWriter(output, compress=args.gzip, fsync=args.fsync)
+    rate_limiter = create_rate_limiter(args.rate_limit_backend, url=args.redis_url, rate=args.rate)
+    archive = PageArchive() if args.archive else None
+
+    async def run():
+        try:
+            return await run_scraper(engine=args.engine, num_workers=args.workers, crawl_id=args.crawl_id,
+                                     write_batch=writer.write_batch if writer else None, output=output,
+                                     parser=args.parser, search_engine=args.search_engine,
+                                     rate_limiter=rate_limiter, queue_size=args.queue_size, archive=archive)
+        finally:
+            await rate_limiter.close()
+            if archive is not None:
+                archive.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        if writer is not None:
+            writer.close()
 
 if __name__ == "__main__":
     run_scraper_sync()
\ No newline at end of file
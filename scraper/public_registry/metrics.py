@@ -0,0 +1,288 @@
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from .redis_client import close_redis, redis_from_url
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a fast parse up to a slow browser render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+CRAWL_BUCKETS = (10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 14400.0, math.inf)
+
+LabelValues = Tuple[str, ...]
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Observed from the event loop and from WebDriver/archive threads
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative count per bucket, then the sum of observations
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0])
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block took, whether or not it raised."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), {"buckets": list(counts), "sum": total}]
+                    for key, (counts, total) in self._series.items()]
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        """Every metric's current values as plain JSON-serializable data."""
+        snapshot = {}
+        for metric in self.metrics.values():
+            snapshot[metric.name] = {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "samples": metric.samples(),
+            }
+            if isinstance(metric, Histogram):
+                # JSON has no infinity; the last bucket is always +Inf
+                snapshot[metric.name]["buckets"] = list(metric.buckets[:-1])
+        return snapshot
+
+    def render(self) -> str:
+        return render_snapshot(self.snapshot())
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """Sum snapshots from several processes into one, e.g. every worker's for the API."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": []})
+            values = {tuple(labels): value for labels, value in target["samples"]}
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = values.get(key)
+                if current is None:
+                    values[key] = value
+                elif metric["type"] == "histogram":
+                    values[key] = {"buckets": [a + b for a, b in zip(current["buckets"], value["buckets"])],
+                                   "sum": current["sum"] + value["sum"]}
+                else:
+                    values[key] = current + value
+            target["samples"] = [[list(labels), value] for labels, value in values.items()]
+    return merged
+
+def _format_labels(labelnames, labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, labels))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render_snapshot(snapshot: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in sorted(metric["samples"]):
+            if metric["type"] == "histogram":
+                cumulative = 0
+                bounds = [_format_value(bound) for bound in metric["buckets"]] + ["+Inf"]
+                for bound, count in zip(bounds, value["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, ('le', bound))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def summarize(snapshot: dict, baseline: Optional[dict] = None) -> Dict[str, dict]:
+    """Per series totals of what was recorded since baseline (an earlier snapshot of the same process)."""
+    baseline = baseline or {}
+    summary = {}
+    for name, metric in snapshot.items():
+        before = {tuple(labels): value for labels, value in baseline.get(name, {}).get("samples", [])}
+        for labels, value in metric["samples"]:
+            previous = before.get(tuple(labels))
+            series = name + _format_labels(metric["labelnames"], labels)
+            if metric["type"] == "histogram":
+                counts = value["buckets"] if previous is None else \
+                    [a - b for a, b in zip(value["buckets"], previous["buckets"])]
+                total = value["sum"] - (previous["sum"] if previous is not None else 0)
+                count = sum(counts)
+                if count:
+                    summary[series] = {"count": count, "total": total, "avg": total / count,
+                                       "p95": _bucket_quantile(metric["buckets"] + [math.inf], counts, 0.95)}
+            else:
+                delta = value - (previous or 0)
+                if delta:
+                    summary[series] = {"count": delta}
+    return summary
+
+def _bucket_quantile(bounds, counts, quantile: float) -> float:
+    # Upper bound of the bucket holding the quantile, as precise as the buckets allow
+    target = quantile * sum(counts)
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return math.inf
+
+def log_summary(baseline: Optional[dict] = None, registry: Optional[MetricsRegistry] = None):
+    """Log where this run's time went, slowest stages first."""
+    summary = summarize((registry or REGISTRY).snapshot(), baseline)
+    timings = sorted(((series, stats) for series, stats in summary.items() if "total" in stats),
+                     key=lambda item: item[1]["total"], reverse=True)
+    for series, stats in timings:
+        logger.info(f"Timing {series}: {stats['count']} in {stats['total']:.2f}s, "
+                    f"avg {stats['avg']:.3f}s, p95 <= {stats['p95']}s")
+    for series, stats in summary.items():
+        if "total" not in stats:
+            logger.info(f"Count {series}: {stats['count']:g}")
+
+REGISTRY = MetricsRegistry()
+
+RATE_LIMIT_WAIT = REGISTRY.histogram("scraper_rate_limiter_wait_seconds",
+                                     "Time spent waiting for a rate limiter token")
+PAGE_FETCH = REGISTRY.histogram("scraper_page_fetch_seconds", "Time to fetch a page from the registry",
+                                ("kind", "engine"))
+RENDER_WAIT = REGISTRY.histogram("scraper_render_wait_seconds", "Time spent waiting for a page to render in a browser",
+                                 ("wait",))
+RENDER_TIMEOUTS = REGISTRY.counter("scraper_render_wait_timeouts_total", "Browser render waits that timed out",
+                                   ("wait",))
+PARSE = REGISTRY.histogram("scraper_parse_seconds", "Time to parse a fetched page", ("kind",))
+QUEUE_DWELL = REGISTRY.histogram("scraper_queue_dwell_seconds",
+                                 "Time a user id spent in the work queue before a worker took it")
+DB_WRITE = REGISTRY.histogram("scraper_db_write_seconds", "Time to write a batch of results")
+ROWS_WRITTEN = REGISTRY.counter("scraper_results_written_total", "Results written", ("outcome",))
+REGISTRANTS = REGISTRY.counter("scraper_registrants_total", "Registrant pages scraped", ("outcome",))
+CRAWL_DURATION = REGISTRY.histogram("scraper_crawl_seconds", "Duration of crawl tasks", ("task",),
+                                    buckets=CRAWL_BUCKETS)
+
+METRICS_KEY = "scraper:metrics"
+METRICS_TTL = 7 * 24 * 3600
+
+class RedisMetricsPublisher:
+    # Each process keeps its own registry and stores a snapshot of it in one Redis hash field,
+    # so the API can serve the sum over every worker; a process' values only grow, so
+    # re-publishing replaces its previous snapshot without double counting
+    def __init__(self, client, registry: Optional[MetricsRegistry] = None, interval: float = 15.0):
+        self.client = client
+        self.registry = registry or REGISTRY
+        self.interval = interval
+        self.field = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisMetricsPublisher":
+        return cls(redis_from_url(url), **kwargs)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.publish()
+
+    async def publish(self):
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(METRICS_KEY, self.field, json.dumps(self.registry.snapshot()))
+                pipe.expire(METRICS_KEY, METRICS_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error publishing metrics: {str(e)}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.publish()
+        await close_redis(self.client)
+
+def decode_snapshots(fields: Dict) -> list:
+    """Snapshots as read back from the metrics hash; unreadable ones are skipped."""
+    snapshots = []
+    for value in fields.values():
+        try:
+            snapshots.append(json.loads(value))
+        except ValueError:
+            continue
+    return snapshots
@@ -0,0 +1,40 @@
+import gzip
+import json
+import logging
+import os
+from dataclasses import asdict
+from typing import List
+from .registrant_scraper import RegistrantInfo
+
+logger = logging.getLogger(__name__)
+
+class NdjsonWriter:
+    # Appends one compact JSON line per registrant so output can be tailed while the crawl
+    # runs; each batch is flushed (and optionally fsynced) so a crash keeps earlier batches
+    def __init__(self, filename: str, compress: bool = False, fsync: bool = False):
+        self.filename = filename
+        self.compress = compress
+        self.fsync = fsync
+        self.written = 0
+        self._raw = open(filename, 'ab')
+
+    def write_batch(self, infos: List[RegistrantInfo]):
+        lines = "".join(json.dumps(asdict(info), ensure_ascii=False, separators=(',', ':')) + "\n"
+                        for info in infos)
+        data = lines.encode('utf-8')
+        if self.compress:
+            # Each batch is written as one complete gzip member, and concatenated members are
+            # valid gzip, so the file is readable between batches and after a crash
+            data = gzip.compress(data)
+        self._raw.write(data)
+        self._raw.flush()
+        if self.fsync:
+            os.fsync(self._raw.fileno())
+        self.written += len(infos)
+
+    def close(self):
+        try:
+            self._raw.close()
+        except Exception as e:
+            logger.error(f"Error closing {self.filename}: {str(e)}")
+        logger.info(f"Wrote {self.written} results to {self.filename}")
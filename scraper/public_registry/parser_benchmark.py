@@ -0,0 +1,100 @@
+"""Benchmark the parser engines over saved registrant and search pages.
+
+    python -m scraper.public_registry.parser_benchmark path/to/pages/*.html [--repeat 5]
+
+Each engine runs in a fresh process so its peak memory is measured in isolation:
+``peak_rss_mb`` is the growth of the process' max RSS while parsing (covers libxml2's
+C allocations) and ``peak_py_mb`` is the tracemalloc peak of Python allocations.
+"""
+import argparse
+import glob
+import gzip
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from typing import List, Tuple
+from .parsers import PARSER_ENGINES, detect_page_kind, parse_registrant_fields, parse_search_user_ids, parse_total_pages
+from .registrant_scraper import RegistrantInfoScraper
+
+def load_pages(patterns: List[str]) -> List[Tuple[str, str]]:
+    pages = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                html = f.read()
+            kind = detect_page_kind(html)
+            if kind is None:
+                print(f"Skipping {path}: not a registrant or search page", file=sys.stderr)
+                continue
+            pages.append((kind, html))
+    return pages
+
+def parse_page(kind: str, html: str, engine: str):
+    if kind == "registrant":
+        return parse_registrant_fields(html, RegistrantInfoScraper.TABLE_IDS, engine=engine)
+    return parse_search_user_ids(html, engine=engine), parse_total_pages(html, engine=engine)
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _run_engine(engine: str, pages: List[Tuple[str, str]], repeat: int, results):
+    # Timing pass without tracemalloc, which would slow the Python-heavy engines down
+    baseline_rss = _max_rss_mb()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for kind, html in pages:
+            parse_page(kind, html, engine)
+    elapsed = time.perf_counter() - start
+    peak_rss = _max_rss_mb() - baseline_rss
+
+    tracemalloc.start()
+    for kind, html in pages:
+        parse_page(kind, html, engine)
+    _, peak_py = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.put({
+        "engine": engine,
+        "pages_per_sec": len(pages) * repeat / elapsed,
+        "ms_per_page": elapsed * 1000 / (len(pages) * repeat),
+        "peak_rss_mb": peak_rss,
+        "peak_py_mb": peak_py / (1024 * 1024),
+    })
+
+def run_benchmark(pages: List[Tuple[str, str]], engines=PARSER_ENGINES, repeat: int = 3) -> List[dict]:
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        queue = context.Queue()
+        process = context.Process(target=_run_engine, args=(engine, pages, repeat, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark registrant/search page parser engines")
+    parser.add_argument("pages", nargs="+", help="HTML files or glob patterns (.html or .html.gz)")
+    parser.add_argument("--engine", action="append", choices=PARSER_ENGINES,
+                        help="Engine to benchmark (repeatable, default all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the pages in the timing run")
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.pages)
+    if not pages:
+        parser.error("no registrant or search pages found")
+    registrants = sum(1 for kind, _ in pages if kind == "registrant")
+    print(f"{len(pages)} pages ({registrants} registrant, {len(pages) - registrants} search), "
+          f"{args.repeat} passes")
+    print(f"{'engine':<10} {'pages/sec':>10} {'ms/page':>9} {'peak_rss_mb':>12} {'peak_py_mb':>11}")
+    for result in run_benchmark(pages, args.engine or PARSER_ENGINES, args.repeat):
+        print(f"{result['engine']:<10} {result['pages_per_sec']:>10.1f} {result['ms_per_page']:>9.2f} "
+              f"{result['peak_rss_mb']:>12.1f} {result['peak_py_mb']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+from bs4 import BeautifulSoup
+import lxml.html
+
+logger = logging.getLogger(__name__)
+
+# "lxml" walks libxml2's tree directly and only visits the nodes it extracts;
+# "bs4-lxml" and "bs4" build a full BeautifulSoup tree with the lxml or pure-Python parser
+PARSER_ENGINES = ("lxml", "bs4-lxml", "bs4")
+DEFAULT_PARSER = "lxml"
+
+# <strong> labels on the registrant page and the RegistrantInfo fields they fill
+LABEL_FIELDS = {
+    "Registration Number": "registration_number",
+    "Date of Registration": "registration_date",
+    "Name used in practice": "name_used_in_practice",
+    "Registrant Type": "registrant_type",
+    "Languages": "languages_of_care",
+    "Registration Status": "registration_status",
+    "Areas of Practice": "areas_of_practice",
+}
+
+def _check_engine(engine: str):
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"Unknown parser engine: {engine}")
+
+def _soup(html: str, engine: str) -> BeautifulSoup:
+    return BeautifulSoup(html, 'lxml' if engine == "bs4-lxml" else 'html.parser')
+
+def parse_registrant_fields(html: str, table_ids: Dict[str, str], engine: str = DEFAULT_PARSER) -> dict:
+    """Extract the name, labelled fields and the given grid tables ({field: table id}) of a registrant page."""
+    _check_engine(engine)
+    if engine == "lxml":
+        return _lxml_registrant_fields(html, table_ids)
+    return _bs4_registrant_fields(html, table_ids, engine)
+
+def parse_search_user_ids(html: str, engine: str = DEFAULT_PARSER) -> List[str]:
+    _check_engine(engine)
+    if engine == "lxml":
+        root = lxml.html.document_fromstring(html)
+        user_ids = []
+        for row in root.xpath("//table//tbody//tr"):
+            cells = row.xpath(".//td[@style='display:none;']")
+            if cells:
+                user_ids.append(cells[0].text_content().strip())
+        return user_ids
+
+    soup = _soup(html, engine)
+    user_ids = []
+    for row in soup.select("table tbody tr"):
+        user_id_cell = row.find("td", {"style": "display:none;"})
+        if user_id_cell:
+            user_ids.append(user_id_cell.text.strip())
+    return user_ids
+
+def parse_total_pages(html: str, engine: str = DEFAULT_PARSER) -> int:
+    _check_engine(engine)
+    if engine == "lxml":
+        root = lxml.html.document_fromstring(html)
+        pagination_info = root.xpath(
+            "//*[contains(concat(' ', normalize-space(@class), ' '), ' rgWrap ')"
+            " and contains(concat(' ', normalize-space(@class), ' '), ' rgInfoPart ')][1]"
+        )
+        if pagination_info:
+            return int(pagination_info[0].xpath(".//strong")[-1].text_content())
+        return 1
+
+    soup = _soup(html, engine)
+    pagination_info = soup.select_one(".rgWrap.rgInfoPart")
+    if pagination_info:
+        return int(pagination_info.find_all("strong")[-1].text)
+    return 1
+
+def _lxml_registrant_fields(html: str, table_ids: Dict[str, str]) -> dict:
+    root = lxml.html.document_fromstring(html)
+    h3 = next(root.iter("h3"), None)
+    fields = {"name": h3.text_content().strip() if h3 is not None else "Unknown"}
+
+    for p in root.iter("p"):
+        strong_tag = next(p.iter("strong"), None)
+        if strong_tag is None:
+            continue
+        field_name = LABEL_FIELDS.get(strong_tag.text_content().strip().rstrip(":"))
+        if field_name:
+            # The value is the text node right after </strong>
+            fields[field_name] = strong_tag.tail.strip() if strong_tag.tail else None
+
+    for field_name, table_id in table_ids.items():
+        fields[field_name] = _lxml_table(root, table_id)
+    return fields
+
+def _lxml_table(root, table_id: str) -> List[Dict[str, str]]:
+    try:
+        table = root.get_element_by_id(table_id, None)
+        if table is None or table.tag != "table":
+            return []
+        headers = [header.text_content().strip() for header in table.iter("th")]
+        return _rows(headers, ([cell.text_content().strip() for cell in row.iter("td")]
+                               for row in table.iter("tr")))
+    except Exception as e:
+        logger.error(f"Error extracting table data: {str(e)}")
+        return []
+
+def _bs4_registrant_fields(html: str, table_ids: Dict[str, str], engine: str) -> dict:
+    soup = _soup(html, engine)
+    h3 = soup.find("h3")
+    fields = {"name": h3.text.strip() if h3 else "Unknown"}
+
+    for p in soup.find_all("p"):
+        strong_tag = p.find("strong")
+        if strong_tag:
+            field_name = LABEL_FIELDS.get(strong_tag.text.strip().rstrip(":"))
+            if field_name:
+                fields[field_name] = strong_tag.next_sibling.strip() if strong_tag.next_sibling else None
+
+    for field_name, table_id in table_ids.items():
+        fields[field_name] = _bs4_table(soup, table_id)
+    return fields
+
+def _bs4_table(soup: BeautifulSoup, table_id: str) -> List[Dict[str, str]]:
+    try:
+        table = soup.find('table', {'id': table_id})
+        if not table:
+            return []
+        headers = [header.text.strip() for header in table.find_all('th')]
+        return _rows(headers, ([cell.text.strip() for cell in row.find_all('td')]
+                               for row in table.find_all('tr')))
+    except Exception as e:
+        logger.error(f"Error extracting table data: {str(e)}")
+        return []
+
+def _rows(headers: List[str], rows: Iterable[List[str]]) -> List[Dict[str, str]]:
+    return [{headers[i] if headers else f'Column {i+1}': value for i, value in enumerate(cells)}
+            for cells in rows if cells]
+
+def detect_page_kind(html: str) -> Optional[str]:
+    if "gwpciRegistrantHistoryIQA" in html or "gwpciPracticeLocationsIQA" in html:
+        return "registrant"
+    if "gwpciNewQueryMenuCommon" in html:
+        return "search"
+    return None
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Optional
+from .redis_client import close_redis, redis_from_url
+
+logger = logging.getLogger(__name__)
+
+# Counters are summed across every process publishing under the same key (a sharded crawl's
+# discovery task and all of its shards); gauges hold the latest value any of them set
+COUNTERS = ("pages_done", "discovered", "queued", "scraped", "failed")
+GAUGES = ("pages_total", "rate", "stage")
+STAGES = ("searching", "scraping", "finished")
+
+PROGRESS_TTL = 24 * 3600
+
+def progress_key(task_id: str) -> str:
+    return f"scraper:progress:{task_id}"
+
+def progress_channel(task_id: str) -> str:
+    return f"scraper:progress:{task_id}:updates"
+
+def decode_progress(fields: Dict) -> dict:
+    """Typed snapshot from the progress hash as read back from Redis."""
+    fields = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+              for k, v in fields.items()}
+    snapshot = {}
+    for name, value in fields.items():
+        if name in COUNTERS or name == "pages_total":
+            snapshot[name] = int(value)
+        elif name in ("rate", "updated_at"):
+            snapshot[name] = float(value)
+        else:
+            snapshot[name] = value
+    return snapshot
+
+class RedisProgressPublisher:
+    # Keeps a crawl's progress in a Redis hash (read by new subscribers and status polls)
+    # and publishes every updated snapshot on the crawl's channel
+    def __init__(self, client, task_id: str):
+        self.client = client
+        self.task_id = task_id
+
+    @classmethod
+    def from_url(cls, url: str, task_id: str) -> "RedisProgressPublisher":
+        return cls(redis_from_url(url), task_id)
+
+    async def publish(self, deltas: Dict[str, int], gauges: Dict[str, object]):
+        key = progress_key(self.task_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for name, amount in deltas.items():
+                if amount:
+                    pipe.hincrby(key, name, amount)
+            pipe.hset(key, mapping={**{name: str(value) for name, value in gauges.items()},
+                                    "updated_at": str(time.time())})
+            pipe.expire(key, PROGRESS_TTL)
+            pipe.hgetall(key)
+            results = await pipe.execute()
+        snapshot = decode_progress(results[-1])
+        await self.client.publish(progress_channel(self.task_id), json.dumps(snapshot))
+
+    async def close(self):
+        await close_redis(self.client)
+
+class ProgressTracker:
+    # Counts crawl progress in memory and, with a publisher, pushes it every `interval`
+    # seconds (only what changed since the last push), so hot paths never wait on Redis
+    def __init__(self, publisher: Optional[RedisProgressPublisher] = None, interval: float = 1.0):
+        self.publisher = publisher
+        self.interval = interval
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.gauges: Dict[str, object] = {}
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+        self._pending[name] += amount
+        self._dirty = True
+
+    def set(self, name: str, value):
+        if self.gauges.get(name) != value:
+            self.gauges[name] = value
+            self._dirty = True
+
+    def snapshot(self) -> dict:
+        return {**self.counters, **self.gauges}
+
+    def start(self):
+        if self.publisher is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        if self.publisher is None or not self._dirty:
+            return
+        pending, self._pending = self._pending, dict.fromkeys(COUNTERS, 0)
+        self._dirty = False
+        try:
+            await self.publisher.publish(pending, dict(self.gauges))
+        except Exception as e:
+            # Keep the deltas for the next push
+            for name, amount in pending.items():
+                self._pending[name] += amount
+            self._dirty = True
+            logger.warning(f"Error publishing crawl progress: {str(e)}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self.publisher is not None:
+            await self.publisher.close()
@@ -1,28 +1,227 @@
 import asyncio
+import logging
 import time
+from typing import Optional
+from .metrics import RATE_LIMIT_WAIT
+from .redis_client import close_redis, redis_from_url
+
+logger = logging.getLogger(__name__)
 
 class RateLimiter:
-    def __init__(self, rate: int, per: float = 1.0, burst: int = 1):
+    def __init__(self, rate: float, per: float = 1.0, burst: int = 1):
         self.rate = rate
         self.per = per
         self.burst = burst
         self.tokens = burst
         self.updated_at = time.monotonic()
         self.lock = asyncio.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def current_rate(self) -> float:
+        """Requests per second currently allowed."""
+        return self.rate / self.per
 
     async def acquire(self):
+        start = time.monotonic()
+        # Reserve a token under the lock but sleep outside it: tokens may go negative, and each
+        # waiter sleeps until its own reservation is covered, so waiters don't serialize each other
         async with self.lock:
             now = time.monotonic()
             time_passed = now - self.updated_at
-            self.tokens += time_passed * (self.rate / self.per)
-            if self.tokens > self.burst:
-                self.tokens = self.burst
+            self.tokens = min(self.tokens + time_passed * self.current_rate, self.burst)
             self.updated_at = now
+            self.tokens -= 1
+            sleep_duration = -self.tokens / self.current_rate if self.tokens < 0 else 0.0
 
-            if self.tokens < 1:
-                sleep_duration = (1 - self.tokens) / (self.rate / self.per)
+        await self._wait(start, sleep_duration)
+
+    async def _wait(self, start: float, sleep_duration: float):
+        if sleep_duration > 0:
+            self.waiting += 1
+            try:
                 await asyncio.sleep(sleep_duration)
-                self.tokens = 0
-                self.updated_at = time.monotonic()
-            else:
-                self.tokens -= 1
\ No newline at end of file
+            finally:
+                self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        RATE_LIMIT_WAIT.observe(waited)
+
+    def record(self, latency: float, ok: bool = True, status: Optional[int] = None):
+        """Feedback about a finished request; a fixed-rate limiter ignores it."""
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.current_rate,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+class AdaptiveRateLimiter(RateLimiter):
+    # AIMD: the rate grows by `increase` after every `window` healthy responses and is
+    # multiplied by `decrease` on a 429/503, a failed or unparseable page, or a response
+    # slower than `slow_factor` times the running latency baseline
+    BACKOFF_STATUSES = (429, 503)
+
+    def __init__(self, rate: float = 2, per: float = 1.0, burst: int = 1, min_rate: float = 0.5,
+                 max_rate: float = 10, increase: float = 0.5, decrease: float = 0.5, window: int = 20,
+                 slow_factor: float = 2.0, cooldown: float = 5.0):
+        super().__init__(rate, per, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.slow_factor = slow_factor
+        # Requests already in flight when the server degrades report together; back off once for them
+        self.cooldown = cooldown
+        self.latency_baseline: Optional[float] = None
+        self.healthy = 0
+        self.backoffs = 0
+        self.last_backoff = 0.0
+
+    def record(self, latency: float, ok: bool = True, status: Optional[int] = None):
+        if status in self.BACKOFF_STATUSES:
+            self._back_off(f"HTTP {status}")
+        elif not ok:
+            self._back_off("failed request")
+        elif self.latency_baseline is not None and latency > self.slow_factor * self.latency_baseline:
+            self._back_off(f"slow response ({latency:.2f}s vs {self.latency_baseline:.2f}s baseline)")
+        else:
+            self.healthy += 1
+            if self.healthy >= self.window:
+                self.healthy = 0
+                self._set_rate(self.current_rate + self.increase)
+        if ok:
+            # Exponentially weighted so the baseline follows gradual changes but not single spikes
+            self.latency_baseline = latency if self.latency_baseline is None else \
+                0.9 * self.latency_baseline + 0.1 * latency
+
+    def _back_off(self, reason: str):
+        self.healthy = 0
+        now = time.monotonic()
+        if now - self.last_backoff < self.cooldown:
+            return
+        self.last_backoff = now
+        self.backoffs += 1
+        previous = self.current_rate
+        self._set_rate(previous * self.decrease)
+        logger.info(f"Rate limiter backing off from {previous:.2f} to {self.current_rate:.2f} req/s: {reason}")
+
+    def _set_rate(self, requests_per_second: float):
+        requests_per_second = min(max(requests_per_second, self.min_rate), self.max_rate)
+        self.rate = requests_per_second * self.per
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({
+            "backoffs": self.backoffs,
+            "latency_baseline": self.latency_baseline,
+        })
+        return stats
+
+# Same reservation scheme as RateLimiter.acquire, run atomically in Redis against a bucket
+# shared by every process. Redis' own clock is used so worker clock skew doesn't matter.
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(tokens + math.max(now - updated_at, 0) * rate, burst) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 60000)
+if tokens < 0 then
+    return tostring(-tokens / rate)
+end
+return '0'
+"""
+
+class RedisTokenBucket:
+    def __init__(self, client):
+        self.client = client
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTokenBucket":
+        return cls(redis_from_url(url))
+
+    async def reserve(self, key: str, rate: float, burst: int) -> float:
+        """Take a token from the shared bucket; returns how long the caller must wait for it."""
+        return float(await self._script(keys=[key], args=[rate, burst]))
+
+    async def close(self):
+        await close_redis(self.client)
+
+class MemoryTokenBucket:
+    # In-process stand-in for RedisTokenBucket with the same semantics, for tests and local runs
+    def __init__(self):
+        self.buckets = {}
+
+    async def reserve(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (burst, now))
+        tokens = min(tokens + max(now - updated_at, 0) * rate, burst) - 1
+        self.buckets[key] = (tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    async def close(self):
+        pass
+
+class DistributedRateLimiter(RateLimiter):
+    # One token bucket shared by every worker process, so adding Celery workers or shards
+    # doesn't multiply the load on the registry
+    def __init__(self, backend, key: str = "scraper:rate_limiter", rate: float = 2, per: float = 1.0,
+                 burst: int = 1):
+        super().__init__(rate, per, burst)
+        self.backend = backend
+        self.key = key
+        self.backend_errors = 0
+
+    async def acquire(self):
+        start = time.monotonic()
+        try:
+            sleep_duration = await self.backend.reserve(self.key, self.current_rate, self.burst)
+        except Exception as e:
+            # Keep crawling at the same rate, though only limited within this process
+            self.backend_errors += 1
+            logger.warning(f"Shared rate limiter unavailable, using local limit: {str(e)}")
+            return await super().acquire()
+        await self._wait(start, sleep_duration)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["backend_errors"] = self.backend_errors
+        return stats
+
+RATE_LIMIT_BACKENDS = ("local", "redis", "memory")
+
+def create_rate_limiter(backend: str = "local", url: Optional[str] = None, rate: float = 2,
+                        key: str = "scraper:rate_limiter") -> RateLimiter:
+    """Build the crawl's limiter: adaptive per process ("local") or a shared bucket ("redis"/"memory")."""
+    if backend == "local":
+        return AdaptiveRateLimiter(rate=rate, per=1.0, burst=1, min_rate=min(0.5, rate), max_rate=max(10, rate))
+    if backend == "redis":
+        if not url:
+            raise ValueError("The redis rate limit backend needs a Redis URL")
+        return DistributedRateLimiter(RedisTokenBucket.from_url(url), key=key, rate=rate)
+    if backend == "memory":
+        return DistributedRateLimiter(MemoryTokenBucket(), key=key, rate=rate)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
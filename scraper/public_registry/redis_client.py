@@ -0,0 +1,10 @@
+# redis is only needed by the Redis-backed rate limiter, progress and metrics, so it is imported lazily
+
+def redis_from_url(url: str):
+    import redis.asyncio
+    return redis.asyncio.from_url(url)
+
+async def close_redis(client):
+    """Close a redis.asyncio client or pubsub; aclose() replaced close() in redis 5."""
+    close = getattr(client, "aclose", None) or client.close
+    await close()
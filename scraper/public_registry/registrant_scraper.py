@@ -1,16 +1,16 @@
-import asyncio
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from typing import List, Dict, Optional, Tuple
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-import time
-from webdriver_manager.chrome import ChromeDriverManager
 import logging
+import time
+import aiohttp
+from .archive import PageArchive
+from .driver_pool import DriverPool
+from .fetchers import HttpFetcher
+from .metrics import PAGE_FETCH, PARSE
+from .parsers import DEFAULT_PARSER, PARSER_ENGINES, parse_registrant_fields
+from .rate_limiter import RateLimiter
+from .waits import WaitStats, wait_until, elements_present
 
 logger = logging.getLogger(__name__)
 
@@ -32,90 +32,124 @@ class RegistrantInfo:
 
 class RegistrantInfoScraper:
     BASE_URL = "https://members.collegeofopticians.ca/coo/Public%20Register/Reigstrant-Information.aspx"
-    
-    def __init__(self):
-        self.driver = self._setup_driver()
+    ENGINES = ("http", "selenium")
+
+    REGISTRANT_HISTORY_TABLE_ID = 'ctl01_TemplateBody_WebPartManager1_gwpciRegistrantHistoryIQA_ciRegistrantHistoryIQA_ResultsGrid_Grid1_ctl00'
+    PRACTICE_LOCATIONS_TABLE_ID = 'ctl01_TemplateBody_WebPartManager1_gwpciPracticeLocationsIQA_ciPracticeLocationsIQA_ResultsGrid_Grid1_ctl00'
+    PROFESSIONAL_CORPORATION_TABLE_ID = 'ctl01_TemplateBody_WebPartManager1_gwpciProfessionalCorporationIQA_ciProfessionalCorporationIQA_ResultsGrid_Grid1_ctl00'
+
+    TABLE_IDS = {
+        'registrant_history': REGISTRANT_HISTORY_TABLE_ID,
+        'practice_locations': PRACTICE_LOCATIONS_TABLE_ID,
+        'professional_corporation': PROFESSIONAL_CORPORATION_TABLE_ID,
+    }
 
-    @staticmethod
-    def _setup_driver():
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument('--log-level=3')  # Only show fatal errors
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=chrome_options)
+    # Tables that must be present in a fetched page for it to be parsed without a browser
+    REQUIRED_TABLE_IDS = (REGISTRANT_HISTORY_TABLE_ID, PRACTICE_LOCATIONS_TABLE_ID)
+
+    def __init__(self, engine: str = "http", http_fetcher: Optional[HttpFetcher] = None,
+                 render_timeout: float = 10.0, wait_stats: Optional[WaitStats] = None,
+                 driver_pool: Optional[DriverPool] = None, parser: str = DEFAULT_PARSER,
+                 archive: Optional[PageArchive] = None, crawl_id: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown fetch engine: {engine}")
+        if parser not in PARSER_ENGINES:
+            raise ValueError(f"Unknown parser engine: {parser}")
+        self.engine = engine
+        self.parser = parser
+        self._owns_fetcher = http_fetcher is None and engine == "http"
+        self.http_fetcher = http_fetcher or (HttpFetcher() if engine == "http" else None)
+        # Browsers are checked out per page; without a shared pool a private one-browser
+        # pool is used, which only starts Chrome on the first page that needs it
+        self._owns_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool(max_size=1)
+        self.render_timeout = render_timeout
+        # HTTP status and duration of the last request to the registry, reported to the rate
+        # limiter; the duration leaves out browser checkout and render waits
+        self.last_status: Optional[int] = None
+        self.last_latency: Optional[float] = None
+        self.wait_stats = wait_stats or WaitStats()
+        # Pages are archived before parsing, so a parser fix can be applied without re-crawling
+        self.archive = archive
+        self.crawl_id = crawl_id
+        # The caller acquires a token per scrape(); a Selenium fallback is a second request
+        # to the registry and takes another one
+        self.rate_limiter = rate_limiter
 
     async def scrape(self, user_id: str) -> RegistrantInfo:
         url = f"{self.BASE_URL}?UserID={user_id}"
+        self.last_status = None
+        self.last_latency = None
         try:
-            self.driver.get(url)
-            await asyncio.sleep(10)  # Wait for dynamic content to load
-            
-            html = self.driver.page_source
-            return self._parse_registrant_info(html, user_id, url)
+            if self.engine == "http":
+                started = time.monotonic()
+                try:
+                    with PAGE_FETCH.time(kind="registrant", engine="http"):
+                        html = await self.http_fetcher.fetch(url)
+                finally:
+                    self.last_latency = time.monotonic() - started
+                self.last_status = 200
+                if self._has_required_content(html):
+                    await self._archive_page(user_id, url, html)
+                    return self._parse_registrant_info(html, user_id, url, self.parser)
+                logger.info(f"Registrant tables missing from HTTP response for URL {url}, falling back to Selenium")
+                if self.rate_limiter is not None:
+                    # The HTTP request itself succeeded; the caller reports the fallback's
+                    self.rate_limiter.record(self.last_latency, ok=True, status=self.last_status)
+                    await self.rate_limiter.acquire()
+                self.last_status = None
+                self.last_latency = None
+
+            with PAGE_FETCH.time(kind="registrant", engine="selenium"):
+                html = await self._fetch_with_selenium(url)
+            await self._archive_page(user_id, url, html)
+            return self._parse_registrant_info(html, user_id, url, self.parser)
         except Exception as e:
+            if isinstance(e, aiohttp.ClientResponseError):
+                self.last_status = e.status
             logger.error(f"Error scraping registrant info for URL {url}: {str(e)}")
             return RegistrantInfo(name=f"Error: {str(e)}", userid=user_id, url=url)
 
-    def _parse_registrant_info(self, html: str, userid: str, url: str) -> RegistrantInfo:
+    async def _archive_page(self, user_id: str, url: str, html: str):
+        if self.archive is not None:
+            await self.archive.store("registrant", user_id, html, url=url, crawl_id=self.crawl_id)
+
+    async def _fetch_with_selenium(self, url: str) -> str:
+        async with self.driver_pool.checkout() as browser:
+            browser.pages_served += 1
+            html, self.last_latency = await browser.run(self._render_page, browser.driver, url)
+            return html
+
+    def _render_page(self, driver, url: str) -> Tuple[str, float]:
+        """The rendered page and how long the page load itself took."""
+        started = time.monotonic()
+        driver.get(url)
+        load_time = time.monotonic() - started
+        # Ready once the name has rendered. Not every registrant has a history or locations grid,
+        # so waiting for those would time out on each one without them; on timeout parse whatever is there
+        wait_until(driver, elements_present((By.TAG_NAME, "h3")), self.render_timeout,
+                   "registrant_render", self.wait_stats)
+        return driver.page_source, load_time
+
+    @classmethod
+    def _has_required_content(cls, html: str) -> bool:
+        # Cheap substring checks so pages needing a browser are detected before a full parse
+        return "<h3" in html and all(table_id in html for table_id in cls.REQUIRED_TABLE_IDS)
+
+    @classmethod
+    def _parse_registrant_info(cls, html: str, userid: str, url: str,
+                               parser: str = DEFAULT_PARSER) -> RegistrantInfo:
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            name = soup.find("h3").text.strip() if soup.find("h3") else "Unknown"
-            info = RegistrantInfo(name=name, userid=userid, url=url)
-            
-            for p in soup.find_all("p"):
-                strong_tag = p.find("strong")
-                if strong_tag:
-                    label = strong_tag.text.strip().rstrip(":")
-                    value = strong_tag.next_sibling.strip() if strong_tag.next_sibling else None
-                    
-                    if label == "Registration Number":
-                        info.registration_number = value
-                    elif label == "Date of Registration":
-                        info.registration_date = value
-                    elif label == "Name used in practice":
-                        info.name_used_in_practice = value
-                    elif label == "Registrant Type":
-                        info.registrant_type = value
-                    elif label == "Languages":
-                        info.languages_of_care = value
-                    elif label == "Registration Status":
-                        info.registration_status = value
-                    elif label == "Areas of Practice":
-                        info.areas_of_practice = value
-            
-            info.registrant_history = self._extract_table_data(soup, 'ctl01_TemplateBody_WebPartManager1_gwpciRegistrantHistoryIQA_ciRegistrantHistoryIQA_ResultsGrid_Grid1_ctl00')
-            info.practice_locations = self._extract_table_data(soup, 'ctl01_TemplateBody_WebPartManager1_gwpciPracticeLocationsIQA_ciPracticeLocationsIQA_ResultsGrid_Grid1_ctl00')
-            info.professional_corporation = self._extract_table_data(soup, 'ctl01_TemplateBody_WebPartManager1_gwpciProfessionalCorporationIQA_ciProfessionalCorporationIQA_ResultsGrid_Grid1_ctl00')
-            
-            return info
+            with PARSE.time(kind="registrant"):
+                fields = parse_registrant_fields(html, cls.TABLE_IDS, engine=parser)
+            return RegistrantInfo(userid=userid, url=url, **fields)
         except Exception as e:
             logger.error(f"Error parsing registrant info: {str(e)}")
             return RegistrantInfo(name=f"Error: {str(e)}", userid=userid, url=url)
 
-    @staticmethod
-    def _extract_table_data(soup: BeautifulSoup, table_id: str) -> List[Dict[str, str]]:
-        try:
-            table = soup.find('table', {'id': table_id})
-            if not table:
-                return []
-            
-            headers = [header.text.strip() for header in table.find_all('th')]
-            rows = []
-            for row in table.find_all('tr'):
-                cells = row.find_all('td')
-                if cells:
-                    row_data = {headers[i] if headers else f'Column {i+1}': cell.text.strip() 
-                                for i, cell in enumerate(cells)}
-                    rows.append(row_data)
-            return rows
-        except Exception as e:
-            logger.error(f"Error extracting table data: {str(e)}")
-            return []
-
     async def close(self):
-        try:
-            self.driver.quit()
-        except Exception as e:
-            logger.error(f"Error closing WebDriver: {str(e)}")
\ No newline at end of file
+        if self._owns_fetcher:
+            await self.http_fetcher.close()
+        if self._owns_pool:
+            await self.driver_pool.close()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from .archive import PageArchive, read_page
+from .parsers import DEFAULT_PARSER
+from .registrant_scraper import RegistrantInfo, RegistrantInfoScraper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50
+DEFAULT_BATCH_SIZE = 500
+
+def _parse_chunk(directory: str, pages: List[Tuple[str, str, str]], parser: str) -> List[RegistrantInfo]:
+    # Runs in a pool process: blobs are read and decompressed there too, so only
+    # (user id, url, hash) tuples and parsed results cross the process boundary
+    results = []
+    for user_id, url, sha256 in pages:
+        try:
+            html = read_page(directory, sha256)
+        except Exception as e:
+            logger.error(f"Error reading archived page {sha256} for user {user_id}: {str(e)}")
+            results.append(RegistrantInfo(name=f"Error: {str(e)}", userid=user_id, url=url))
+            continue
+        results.append(RegistrantInfoScraper._parse_registrant_info(html, user_id, url, parser))
+    return results
+
+@dataclass
+class ReparseStats:
+    pages: int = 0
+    parsed: int = 0
+    failed: int = 0
+    written: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+def reparse_archive(archive: PageArchive, write_batch: Callable[[List[RegistrantInfo]], Optional[int]],
+                    crawl_id: Optional[str] = None, parser: str = DEFAULT_PARSER, workers: Optional[int] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    keep_errors: bool = False,
+                    on_progress: Optional[Callable[[ReparseStats], None]] = None) -> ReparseStats:
+    """Parse the latest archived page of every registrant again and pass the results to write_batch."""
+    workers = workers or os.cpu_count() or 1
+    pages = [(page.key, page.url, page.sha256) for page in archive.pages("registrant", crawl_id=crawl_id)]
+    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+    stats = ReparseStats()
+    started = time.monotonic()
+    batch: List[RegistrantInfo] = []
+
+    def flush():
+        written = write_batch(batch)
+        stats.written += written if written is not None else len(batch)
+        batch.clear()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # A few chunks per process in flight keeps every core busy while results are written,
+        # without holding the whole archive's results in memory
+        pending = set()
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            while next_chunk < len(chunks) and len(pending) < workers * 2:
+                pending.add(pool.submit(_parse_chunk, str(archive.directory), chunks[next_chunk], parser))
+                next_chunk += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for info in future.result():
+                    stats.pages += 1
+                    ok = not info.name.startswith("Error: ")
+                    if ok:
+                        stats.parsed += 1
+                    else:
+                        stats.failed += 1
+                    # By default a page that no longer parses doesn't overwrite the stored result
+                    if ok or keep_errors:
+                        batch.append(info)
+                if len(batch) >= batch_size:
+                    flush()
+                    stats.elapsed = time.monotonic() - started
+                    if on_progress is not None:
+                        on_progress(stats)
+        if batch:
+            flush()
+    stats.elapsed = time.monotonic() - started
+    return stats
@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, List, Tuple
+import lxml.html
+from .fetchers import HttpFetcher
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PREFIX = "ctl01$TemplateBody$WebPartManager1$gwpciNewQueryMenuCommon$ciNewQueryMenuCommon$ResultsGrid"
+FILTER_FIELD = f"{SEARCH_PREFIX}$Sheet0$Input7$DropDown1"
+SUBMIT_FIELD = f"{SEARCH_PREFIX}$Sheet0$SubmitButton"
+GRID_UNIQUE_ID = f"{SEARCH_PREFIX}$Grid1"
+GRID_TABLE_VIEW_ID = f"{GRID_UNIQUE_ID}$ctl00"
+
+class PostbackSearchClient:
+    # Replays the Member-Search form and the Telerik grid's postbacks over plain HTTP.
+    # __VIEWSTATE/__EVENTVALIDATION and the other form fields are carried from response to
+    # response like a browser would; grid commands are sent the way RadGrid's client-side
+    # fireCommand() posts them ("FireCommand:<table view>;<command>;<argument>").
+    def __init__(self, http_fetcher: HttpFetcher, url: str, filter_value: str = "ARTIFICIAL",
+                 page_size: int = 500):
+        self.http_fetcher = http_fetcher
+        self.url = url
+        self.filter_value = filter_value
+        self.page_size = page_size
+        self._form: List[Tuple[str, str]] = []
+        self._action = url
+
+    async def open(self) -> str:
+        """Run the search and switch the grid to page_size rows; returns the first results page."""
+        html = await self.http_fetcher.fetch(self.url)
+        self._load_form(html)
+
+        submit_value = self._submit_value(html)
+        html = await self._postback(extra={SUBMIT_FIELD: submit_value})
+        self._load_form(html)
+
+        html = await self._postback(GRID_UNIQUE_ID, f"FireCommand:{GRID_TABLE_VIEW_ID};PageSize;{self.page_size}")
+        self._load_form(html)
+        return html
+
+    async def fetch_page(self, page: int) -> str:
+        # Every page is requested from the same post-search form state, so pages are
+        # independent of each other and can be fetched concurrently
+        return await self._postback(GRID_UNIQUE_ID, f"FireCommand:{GRID_TABLE_VIEW_ID};Page;{page}")
+
+    async def _postback(self, event_target: str = "", event_argument: str = "",
+                        extra: Dict[str, str] = None) -> str:
+        # The filter is re-sent with every postback in case a response doesn't echo it back
+        overrides = {"__EVENTTARGET": event_target, "__EVENTARGUMENT": event_argument,
+                     FILTER_FIELD: self.filter_value, **(extra or {})}
+        data = [(name, value) for name, value in self._form if name not in overrides]
+        data.extend(overrides.items())
+        return await self.http_fetcher.post(self._action, data)
+
+    def _load_form(self, html: str):
+        root = lxml.html.document_fromstring(html, base_url=self.url)
+        forms = root.forms
+        if not forms:
+            raise ValueError("No form found in search page response")
+        form = forms[0]
+        # form_values() gives the fields a browser would submit (hidden state, selected options, ...)
+        self._form = list(form.form_values())
+        if "__VIEWSTATE" not in dict(self._form):
+            raise ValueError("Search page response has no __VIEWSTATE")
+        if form.action:
+            self._action = form.action
+
+    @staticmethod
+    def _submit_value(html: str) -> str:
+        root = lxml.html.document_fromstring(html)
+        buttons = root.xpath("//input[@name=$name]", name=SUBMIT_FIELD)
+        return buttons[0].get("value", "") if buttons else ""
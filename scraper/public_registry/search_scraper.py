@@ -1,38 +1,162 @@
 import asyncio
 import logging
-from typing import List
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from typing import List, Optional
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-import time
-from webdriver_manager.chrome import ChromeDriverManager
+from .archive import PageArchive
+from .checkpoint import CrawlCheckpoint
+from .driver_pool import DriverPool
+from .fetchers import HttpFetcher
+from .metrics import PAGE_FETCH, PARSE
+from .search_postback import PostbackSearchClient
+from .progress import ProgressTracker
+from .work_queue import WorkQueue
+from .parsers import DEFAULT_PARSER, parse_search_user_ids, parse_total_pages
+from .waits import WaitStats, wait_until, grid_rows_signature, grid_rows_changed
 
 logger = logging.getLogger(__name__)
 
 class SearchScraper:
     URL = "https://members.collegeofopticians.ca/coo/Public%20Register/Member-Search.aspx"
+    # "postback" replays the grid's ASP.NET postbacks over HTTP and falls back to driving
+    # the page in a browser ("selenium") if that fails before any results were queued
+    ENGINES = ("postback", "selenium")
+    SELENIUM_PAGE_SIZE = 50  # Option picked from the grid's page size combo
     
-    def __init__(self, queue: asyncio.Queue, stop_flag: asyncio.Event):
-        self.driver = self._setup_driver()
+    def __init__(self, queue: WorkQueue, stop_flag: asyncio.Event,
+                 page_timeout: float = 30.0, wait_stats: Optional[WaitStats] = None,
+                 driver_pool: Optional[DriverPool] = None, checkpoint: Optional[CrawlCheckpoint] = None,
+                 parser: str = DEFAULT_PARSER, engine: str = "postback",
+                 http_fetcher: Optional[HttpFetcher] = None, postback_page_size: int = 500,
+                 concurrency: int = 4, progress: Optional[ProgressTracker] = None,
+                 archive: Optional[PageArchive] = None, crawl_id: Optional[str] = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown search engine: {engine}")
+        self.engine = engine
+        self._owns_fetcher = http_fetcher is None
+        self.http_fetcher = http_fetcher or HttpFetcher(limit=concurrency)
+        self.postback_page_size = postback_page_size
+        self.concurrency = concurrency
+        self._owns_pool = driver_pool is None
+        self.driver_pool = driver_pool or DriverPool(max_size=1)
+        # The search session lives in one browser, held for the whole crawl
+        self.browser = None
+        self._browser_failed = False
         self.queue = queue
         self.stop_flag = stop_flag
+        self.page_timeout = page_timeout
+        self.wait_stats = wait_stats or WaitStats()
+        self.checkpoint = checkpoint
+        self.parser = parser
+        self.progress = progress or ProgressTracker()
+        self.archive = archive
+        self.crawl_id = crawl_id
+        # Rows per results page in the running search; set by each engine
+        self._page_size = postback_page_size
+        self._pages_done = 0
 
-    @staticmethod
-    def _setup_driver():
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument('--log-level=3')  # Only show fatal errors
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=chrome_options)
+    @property
+    def driver(self):
+        return self.browser.driver
 
     async def scrape(self):
+        if self.checkpoint is not None and self.checkpoint.search_completed:
+            logger.info("All search pages already completed in checkpoint, skipping search.")
+            return
+        if self.engine == "postback":
+            try:
+                await self._scrape_postback()
+                return
+            except Exception as e:
+                if self._pages_done:
+                    logger.exception(f"An error occurred during postback scraping: {str(e)}")
+                    await self.close()
+                    return
+                logger.warning(f"Postback search failed ({str(e)}), falling back to Selenium")
+        await self._scrape_selenium()
+
+    async def _scrape_postback(self):
+        client = PostbackSearchClient(self.http_fetcher, self.URL, page_size=self.postback_page_size)
+        self._page_size = self.postback_page_size
+        logger.info("Running search over HTTP postbacks...")
+        with PAGE_FETCH.time(kind="search", engine="postback"):
+            html = await client.open()
+        total_pages = parse_total_pages(html, engine=self.parser)
+        with PARSE.time(kind="search"):
+            first_page_ids = parse_search_user_ids(html, engine=self.parser)
+        if not first_page_ids:
+            raise ValueError("Postback search returned no results")
+        logger.info(f"Total pages: {total_pages}")
+        if self.checkpoint is not None:
+            self.checkpoint.record_total_pages(total_pages, self.postback_page_size)
+        self.progress.set("pages_total", total_pages)
+        await self._process_page(1, total_pages, html=html, user_ids=first_page_ids)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_page(page: int):
+            async with semaphore:
+                if self.stop_flag.is_set() or self._is_page_completed(page):
+                    return
+                with PAGE_FETCH.time(kind="search", engine="postback"):
+                    html = await client.fetch_page(page)
+                with PARSE.time(kind="search"):
+                    user_ids = parse_search_user_ids(html, engine=self.parser)
+                if not user_ids:
+                    # A postback whose viewstate or event validation was rejected comes back without
+                    # grid rows; recording it as completed would silently lose the page
+                    raise ValueError(f"Postback for page {page} of {total_pages} returned no results")
+                await self._process_page(page, total_pages, html=html, user_ids=user_ids)
+
+        tasks = [asyncio.create_task(fetch_page(page)) for page in range(2, total_pages + 1)]
         try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other pages before the shared fetcher is closed and the workers are
+            # told the search is over
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        if self.stop_flag.is_set():
+            logger.info("Stop flag set, interrupted search scraper.")
+        logger.info("Search scraping completed.")
+        await self.close()
+
+    def _is_page_completed(self, page: int) -> bool:
+        return self.checkpoint is not None and page in self.checkpoint.completed_pages
+
+    async def _process_page(self, page: int, total_pages: int, html: Optional[str] = None,
+                            user_ids: Optional[List[str]] = None):
+        if self._is_page_completed(page):
+            # Its user ids were re-queued from the checkpoint when the crawl resumed
+            logger.info(f"Skipping page {page} of {total_pages}, already completed")
+            return
+        logger.info(f"Scraping page {page} of {total_pages}")
+        if self.archive is not None and html is not None:
+            # Page numbers only identify a page together with the page size
+            await self.archive.store("search", f"{self._page_size}/{page}", html, url=self.URL,
+                                     crawl_id=self.crawl_id)
+        if user_ids is None:
+            user_ids = await self._parse_results(html)
+        queued = 0
+        for user_id in user_ids:
+            # Ids found on pages completed by an earlier run were already re-queued
+            # and the queue drops ids already queued by this run (rows repeated across pages)
+            if self.checkpoint is None or not self.checkpoint.is_discovered(user_id):
+                if await self.queue.put(user_id):
+                    queued += 1
+        if self.checkpoint is not None:
+            self.checkpoint.record_page(page, user_ids)
+        self._pages_done += 1
+        self.progress.add("pages_done")
+        self.progress.add("discovered", len(user_ids))
+        self.progress.add("queued", queued)
+
+    async def _scrape_selenium(self):
+        try:
+            self.browser = await self.driver_pool.acquire()
             logger.info("Navigating to search page...")
             await self._navigate_to_search_page()
             logger.info("Applying search filter...")
@@ -40,124 +164,145 @@ class SearchScraper:
             logger.info("Performing search...")
             await self._perform_search()
             logger.info("Setting page size...")
-            await self._set_page_size(50)  # Set to 50 items per page
+            await self._set_page_size(self.SELENIUM_PAGE_SIZE)
+            self._page_size = self.SELENIUM_PAGE_SIZE
             logger.info("Getting total pages...")
             total_pages = await self._get_total_pages()
             logger.info(f"Total pages: {total_pages}")
+            if self.checkpoint is not None:
+                self.checkpoint.record_total_pages(total_pages, self.SELENIUM_PAGE_SIZE)
+            self.progress.set("pages_total", total_pages)
             
             for page in range(1, total_pages + 1):
                 if self.stop_flag.is_set():
                     logger.info("Stop flag set, interrupting search scraper...")
                     break
-                logger.info(f"Scraping page {page} of {total_pages}")
-                user_ids = await self._parse_results(self.driver.page_source)
-                for user_id in user_ids:
-                    await self.queue.put(user_id)
+                if not self._is_page_completed(page):
+                    self.browser.pages_served += 1
+                    await self._process_page(page, total_pages, html=await self._page_source())
+                else:
+                    await self._process_page(page, total_pages)
                 
                 if page < total_pages:
                     logger.info("Moving to next page...")
-                    await self._go_to_next_page()
+                    with PAGE_FETCH.time(kind="search", engine="selenium"):
+                        await self._go_to_next_page()
             
             logger.info("Search scraping completed.")
         except Exception as e:
             logger.exception(f"An error occurred during scraping: {str(e)}")
+            self._browser_failed = True
         finally:
             logger.info("Closing browser...")
             await self.close()
 
+    async def _page_source(self) -> str:
+        return await self.browser.run(lambda: self.driver.page_source)
+
     async def _navigate_to_search_page(self):
-        self.driver.get(self.URL)
+        await self.browser.run(self.driver.get, self.URL)
 
     async def _apply_search_filter(self):
         try:
-            # Wait for the dropdown to be present
-            dropdown_locator = (By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input7_DropDown1")
-            WebDriverWait(self.driver, 20).until(EC.presence_of_element_located(dropdown_locator))
-            
-            # Select the dropdown
-            service_area_dropdown = Select(self.driver.find_element(*dropdown_locator))
-            
-            # Select the desired value
-            service_area_dropdown.select_by_value("ARTIFICIAL")
+            await self.browser.run(self._select_filter)
             logger.info("Applied 'ARTIFICIAL' filter to the search.")
         except Exception as e:
             logger.error(f"Error applying search filter: {str(e)}")
             raise
 
+    def _select_filter(self):
+        # Wait for the dropdown to be present
+        dropdown_locator = (By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_Input7_DropDown1")
+        WebDriverWait(self.driver, 20).until(EC.presence_of_element_located(dropdown_locator))
+
+        # Select the dropdown
+        service_area_dropdown = Select(self.driver.find_element(*dropdown_locator))
+
+        # Select the desired value
+        service_area_dropdown.select_by_value("ARTIFICIAL")
+
     async def _set_page_size(self, size: int = 50):
         try:
             logger.info(f"Setting page size to {size}...")
-            
-            # Find and click the page size dropdown to open it
-            dropdown = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_Input"))
-            )
-            self.driver.execute_script("arguments[0].click();", dropdown)
-
-            # Wait for the dropdown options to be visible
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located((By.XPATH, f"//ul[@id='ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_listbox']/li[text()='{size}']"))
-            )
-
-            # Find and click the option for the specified number of items per page
-            page_size_option = self.driver.find_element(By.XPATH, f"//ul[@id='ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_listbox']/li[text()='{size}']")
-            self.driver.execute_script("arguments[0].click();", page_size_option)
-
-            # Wait for the page to reload with the new page size
-            await asyncio.sleep(20)  # Adjust the sleep time as needed
+            await self.browser.run(self._choose_page_size, size)
             logger.info(f"Page size set to {size}")
         except Exception as e:
             logger.error(f"Error setting page size: {str(e)}")
             raise
 
+    def _choose_page_size(self, size: int):
+        # Find and click the page size dropdown to open it
+        dropdown = WebDriverWait(self.driver, 10).until(
+            EC.element_to_be_clickable((By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_Input"))
+        )
+        self.driver.execute_script("arguments[0].click();", dropdown)
+
+        # Wait for the dropdown options to be visible
+        WebDriverWait(self.driver, 10).until(
+            EC.visibility_of_element_located((By.XPATH, f"//ul[@id='ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_listbox']/li[text()='{size}']"))
+        )
+
+        # Find and click the option for the specified number of items per page
+        page_size_option = self.driver.find_element(By.XPATH, f"//ul[@id='ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Grid1_ctl00_ctl03_ctl01_PageSizeComboBox_listbox']/li[text()='{size}']")
+        previous_rows = grid_rows_signature(self.driver)
+        self.driver.execute_script("arguments[0].click();", page_size_option)
+
+        # Wait for the grid to re-render with the new page size
+        wait_until(self.driver, grid_rows_changed(previous_rows), self.page_timeout,
+                   "search_page_size", self.wait_stats)
+
     async def _perform_search(self):
         try:
-            search_button = WebDriverWait(self.driver, 40).until(
-                EC.element_to_be_clickable((By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_SubmitButton"))
-            )
-            search_button.click()
-            WebDriverWait(self.driver, 40).until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
+            await self.browser.run(self._submit_search)
         except Exception as e:
             logger.error(f"Error performing search: {str(e)}")
             raise
 
+    def _submit_search(self):
+        search_button = WebDriverWait(self.driver, 40).until(
+            EC.element_to_be_clickable((By.ID, "ctl01_TemplateBody_WebPartManager1_gwpciNewQueryMenuCommon_ciNewQueryMenuCommon_ResultsGrid_Sheet0_SubmitButton"))
+        )
+        search_button.click()
+        WebDriverWait(self.driver, 40).until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
+
     async def _get_total_pages(self) -> int:
         try:
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            pagination_info = soup.select_one(".rgWrap.rgInfoPart")
-            if pagination_info:
-                return int(pagination_info.find_all("strong")[-1].text)
-            return 1
+            return parse_total_pages(await self._page_source(), engine=self.parser)
         except Exception as e:
             logger.error(f"Error getting total pages: {str(e)}")
             return 1
 
     async def _parse_results(self, html: str) -> List[str]:
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            user_ids = []
-            for row in soup.select("table tbody tr"):
-                user_id_cell = row.find("td", {"style": "display:none;"})
-                if user_id_cell:
-                    user_ids.append(user_id_cell.text.strip())
-            return user_ids
+            with PARSE.time(kind="search"):
+                return parse_search_user_ids(html, engine=self.parser)
         except Exception as e:
             logger.error(f"Error parsing search results: {str(e)}")
             return []
 
     async def _go_to_next_page(self):
         try:
-            next_button = self.driver.find_elements(By.CLASS_NAME, "rgPageNext")
-            if next_button:
-                self.driver.execute_script("arguments[0].click();", next_button[0])
-                time.sleep(20)  # Wait for next page to load
-            else:
+            if not await self.browser.run(self._click_next_page):
                 logger.info("No next page button found.")
         except Exception as e:
             logger.error(f"Error going to next page: {str(e)}")
 
+    def _click_next_page(self) -> bool:
+        next_button = self.driver.find_elements(By.CLASS_NAME, "rgPageNext")
+        if not next_button:
+            return False
+        previous_rows = grid_rows_signature(self.driver)
+        self.driver.execute_script("arguments[0].click();", next_button[0])
+        # Wait for next page to load
+        wait_until(self.driver, grid_rows_changed(previous_rows), self.page_timeout,
+                   "search_next_page", self.wait_stats)
+        return True
+
     async def close(self):
-        try:
-            self.driver.quit()
-        except Exception as e:
-            logger.error(f"Error closing WebDriver: {str(e)}")
\ No newline at end of file
+        if self._owns_fetcher:
+            await self.http_fetcher.close()
+        if self.browser is not None:
+            browser, self.browser = self.browser, None
+            await self.driver_pool.release(browser, failed=self._browser_failed)
+        if self._owns_pool:
+            await self.driver_pool.close()
\ No newline at end of file
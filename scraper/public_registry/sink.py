@@ -0,0 +1,92 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Union
+from .metrics import DB_WRITE, ROWS_WRITTEN
+from .registrant_scraper import RegistrantInfo
+
+logger = logging.getLogger(__name__)
+
+BatchWriter = Callable[[List[RegistrantInfo]], Union[Awaitable[None], None]]
+
+_CLOSE = object()
+
+class ResultSink:
+    # Bounded channel between the registrant workers and a single batch writer. A batch is
+    # flushed once it reaches max_batch results or its oldest result is flush_interval old;
+    # workers block on put() when max_pending results are waiting, so memory stays flat.
+    def __init__(self, write_batch: BatchWriter, max_batch: int = 100, flush_interval: float = 2.0,
+                 max_pending: int = 1000,
+                 on_written: Optional[Callable[[List[RegistrantInfo]], None]] = None):
+        self.write_batch = write_batch
+        # Called with every batch once it was written, e.g. to checkpoint it
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.written = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, info: RegistrantInfo):
+        await self.queue.put(info)
+
+    async def close(self):
+        if self._task is None:
+            return
+        await self.queue.put(_CLOSE)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _CLOSE:
+                await self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = loop.time() + self.flush_interval
+
+            if len(batch) >= self.max_batch or (deadline is not None and loop.time() >= deadline):
+                await self._flush(batch)
+                batch = []
+                deadline = None
+
+    async def _flush(self, batch: List[RegistrantInfo]):
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            result = self.write_batch(batch)
+            if inspect.isawaitable(result):
+                await result
+            DB_WRITE.observe(time.monotonic() - started)
+            ROWS_WRITTEN.inc(len(batch), outcome="written")
+            self.written += len(batch)
+            logger.info(f"Flushed {len(batch)} results ({self.written} written so far)")
+        except Exception as e:
+            # A failed batch is logged and dropped rather than stopping the crawl
+            self.failed += len(batch)
+            ROWS_WRITTEN.inc(len(batch), outcome="failed")
+            logger.error(f"Error writing batch of {len(batch)} results: {str(e)}")
+            return
+        if self.on_written is not None:
+            try:
+                self.on_written(batch)
+            except Exception as e:
+                logger.error(f"Error recording written batch: {str(e)}")
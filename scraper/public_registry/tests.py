@@ -0,0 +1,302 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+from .checkpoint import CrawlCheckpoint
+from .fetchers import HttpFetcher
+from .main import main
+from .output import NdjsonWriter
+from .parsers import PARSER_ENGINES, parse_registrant_fields, parse_search_user_ids, parse_total_pages
+from .rate_limiter import AdaptiveRateLimiter, MemoryTokenBucket, RateLimiter, create_rate_limiter
+from .registrant_scraper import RegistrantInfo, RegistrantInfoScraper
+from .search_scraper import SearchScraper
+from .sink import ResultSink
+
+# Run from the repository root: python -m unittest scraper.public_registry.tests
+
+REGISTRANT_PAGE = f"""<html><body>
+<h3> Jane Doe </h3>
+<p><strong>Registration Number:</strong> 12345</p>
+<p><strong>Date of Registration:</strong> 2001-02-03</p>
+<p><strong>Registration Status:</strong> Active</p>
+<table id="{RegistrantInfoScraper.REGISTRANT_HISTORY_TABLE_ID}">
+  <thead><tr><th>Status</th><th>Date</th></tr></thead>
+  <tbody><tr><td>Registered</td><td>2001-02-03</td></tr></tbody>
+</table>
+<table id="{RegistrantInfoScraper.PRACTICE_LOCATIONS_TABLE_ID}">
+  <thead><tr><th>Address</th><th>City</th><th>Postal Code</th></tr></thead>
+  <tbody><tr><td>1 Main St</td><td>Toronto</td><td>M5V 1A1</td></tr></tbody>
+</table>
+</body></html>"""
+
+SEARCH_PAGE = """<html><body>
+<table><tbody>
+  <tr><td style="display:none;">101</td><td>A</td></tr>
+  <tr><td>header-like row</td></tr>
+  <tr><td style="display:none;">102</td><td>B</td></tr>
+</tbody></table>
+<div class="rgWrap rgInfoPart">Page <strong>1</strong> of <strong>7</strong></div>
+</body></html>"""
+
+def registrant_page(user_id: str) -> str:
+    return REGISTRANT_PAGE.replace("Jane Doe", f"Registrant {user_id}")
+
+class ParserTests(unittest.TestCase):
+    def test_registrant_fields_agree_across_engines(self):
+        expected = {
+            "name": "Jane Doe",
+            "registration_number": "12345",
+            "registration_date": "2001-02-03",
+            "registration_status": "Active",
+            "registrant_history": [{"Status": "Registered", "Date": "2001-02-03"}],
+            "practice_locations": [{"Address": "1 Main St", "City": "Toronto", "Postal Code": "M5V 1A1"}],
+            "professional_corporation": [],
+        }
+        for engine in PARSER_ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(parse_registrant_fields(REGISTRANT_PAGE, RegistrantInfoScraper.TABLE_IDS,
+                                                         engine=engine), expected)
+
+    def test_missing_heading_is_unknown(self):
+        for engine in PARSER_ENGINES:
+            with self.subTest(engine=engine):
+                fields = parse_registrant_fields("<html><body></body></html>", RegistrantInfoScraper.TABLE_IDS,
+                                                 engine=engine)
+                self.assertEqual(fields["name"], "Unknown")
+                self.assertEqual(fields["registrant_history"], [])
+
+    def test_search_page(self):
+        for engine in PARSER_ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(parse_search_user_ids(SEARCH_PAGE, engine=engine), ["101", "102"])
+                self.assertEqual(parse_total_pages(SEARCH_PAGE, engine=engine), 7)
+                self.assertEqual(parse_total_pages("<html><body></body></html>", engine=engine), 1)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            parse_search_user_ids(SEARCH_PAGE, engine="regex")
+
+class CrawlCheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def checkpoint(self, crawl_id: str = "crawl-1") -> CrawlCheckpoint:
+        return CrawlCheckpoint(crawl_id, directory=self.directory)
+
+    def test_invalid_crawl_id(self):
+        for crawl_id in ("", "../etc", "a/b", "-x"):
+            with self.subTest(crawl_id=crawl_id), self.assertRaises(ValueError):
+                CrawlCheckpoint(crawl_id, directory=self.directory)
+
+    def test_replays_journal(self):
+        checkpoint = self.checkpoint()
+        checkpoint.record_total_pages(2, page_size=50)
+        checkpoint.record_page(1, ["a", "b", "c"])
+        checkpoint.record_scraped(RegistrantInfo(name="A", userid="a", url="u"))
+        checkpoint.record_scraped(RegistrantInfo(name="B", userid="b", url="u"))
+        checkpoint.record_written(["a"])
+
+        loaded = self.checkpoint().load()
+        self.assertEqual(loaded.total_pages, 2)
+        self.assertEqual(loaded.completed_pages, {1})
+        self.assertFalse(loaded.search_completed)
+        self.assertEqual(loaded.pending_user_ids(), ["c"])
+        self.assertEqual(loaded.written, {"a"})
+        self.assertEqual([info.userid for info in loaded.iter_unwritten_results()], ["b"])
+        self.assertFalse(loaded.finished)
+
+    def test_page_size_change_forgets_completed_pages(self):
+        checkpoint = self.checkpoint()
+        checkpoint.record_total_pages(4, page_size=25)
+        checkpoint.record_page(1, ["a"])
+        checkpoint.record_total_pages(2, page_size=50)
+
+        loaded = self.checkpoint().load()
+        self.assertEqual(loaded.completed_pages, set())
+        self.assertEqual(list(loaded.discovered), ["a"])
+
+    def test_skips_torn_last_line(self):
+        checkpoint = self.checkpoint()
+        checkpoint.record_page(1, ["a"])
+        with open(checkpoint.path, "a", encoding="utf-8") as f:
+            f.write('{"event": "page", "pa')
+
+        loaded = self.checkpoint().load()
+        self.assertEqual(list(loaded.discovered), ["a"])
+
+    def test_finished_journal_is_compacted(self):
+        checkpoint = self.checkpoint()
+        checkpoint.record_total_pages(1, page_size=50)
+        checkpoint.record_page(1, ["a", "b"])
+        for user_id in ("a", "b"):
+            checkpoint.record_scraped(RegistrantInfo(name="x" * 1000, userid=user_id, url="u"))
+        size = checkpoint.path.stat().st_size
+        checkpoint.record_finished()
+
+        self.assertLess(checkpoint.path.stat().st_size, size / 4)
+        loaded = self.checkpoint().load()
+        self.assertTrue(loaded.finished)
+        self.assertTrue(loaded.search_completed)
+        self.assertEqual(loaded.scraped, {"a", "b"})
+        self.assertEqual(list(loaded.iter_unwritten_results()), [])
+
+class ResumeTests(unittest.TestCase):
+    # A whole crawl against stubbed search and registrant pages, whose first run stops after
+    # one of the two search pages, then resumed
+    USER_IDS = [str(i) for i in range(12)]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = Path(self.directory) / "results.ndjson"
+        self.fetched = []
+        self.interrupt_search = True
+
+        async def fetch(fetcher, url):
+            user_id = url.rsplit("=", 1)[-1]
+            self.fetched.append(user_id)
+            return registrant_page(user_id)
+
+        async def search(scraper):
+            scraper.checkpoint.record_total_pages(2, page_size=6)
+            await scraper._process_page(1, 2, user_ids=self.USER_IDS[:6])
+            if not self.interrupt_search:
+                await scraper._process_page(2, 2, user_ids=self.USER_IDS[6:])
+
+        patches = [
+            mock.patch.dict(os.environ, {"SCRAPER_CHECKPOINT_DIR": self.directory}),
+            mock.patch.object(HttpFetcher, "fetch", fetch),
+            mock.patch.object(SearchScraper, "_scrape_postback", search),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def crawl(self) -> int:
+        writer = NdjsonWriter(str(self.output))
+        try:
+            return asyncio.run(main(crawl_id="resume-test", write_batch=writer.write_batch, num_workers=3,
+                                    rate_limiter=create_rate_limiter("memory", rate=1000)))
+        finally:
+            writer.close()
+
+    def written_user_ids(self):
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line)["userid"] for line in f]
+
+    def test_resume_writes_every_result_once(self):
+        self.assertEqual(self.crawl(), 6)
+        checkpoint = CrawlCheckpoint("resume-test", directory=self.directory).load()
+        self.assertFalse(checkpoint.finished)
+        self.assertEqual(checkpoint.written, set(self.USER_IDS[:6]))
+
+        self.interrupt_search = False
+        self.assertEqual(self.crawl(), 6)
+        self.assertEqual(sorted(self.written_user_ids(), key=int), self.USER_IDS)
+        self.assertEqual(sorted(self.fetched, key=int), self.USER_IDS)
+        self.assertTrue(CrawlCheckpoint("resume-test", directory=self.directory).load().finished)
+
+        # A finished crawl isn't run again
+        self.assertEqual(self.crawl(), 12)
+        self.assertEqual(len(self.written_user_ids()), 12)
+
+class ResultSinkTests(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_and_reports_written(self):
+        batches, recorded = [], []
+        sink = ResultSink(batches.append, max_batch=2, flush_interval=10,
+                          on_written=lambda batch: recorded.extend(info.userid for info in batch))
+        sink.start()
+        for user_id in "abcde":
+            await sink.put(RegistrantInfo(name=user_id, userid=user_id, url="u"))
+        await sink.close()
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(recorded, list("abcde"))
+        self.assertEqual(sink.written, 5)
+
+    async def test_failed_batch_is_not_reported_written(self):
+        recorded = []
+
+        def fail(batch):
+            raise RuntimeError("database down")
+
+        sink = ResultSink(fail, on_written=lambda batch: recorded.extend(batch))
+        sink.start()
+        await sink.put(RegistrantInfo(name="a", userid="a", url="u"))
+        await sink.close()
+        self.assertEqual((sink.written, sink.failed), (0, 1))
+        self.assertEqual(recorded, [])
+
+class RateLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_spaces_requests(self):
+        limiter = RateLimiter(rate=20)
+        started = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        # The first token is available at once, the other four 50ms apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        self.assertEqual(limiter.acquired, 5)
+
+    async def test_concurrent_waiters_are_not_serialized(self):
+        limiter = RateLimiter(rate=20)
+        started = time.monotonic()
+        await asyncio.gather(*[limiter.acquire() for _ in range(5)])
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertLess(elapsed, 0.5)
+
+    async def test_shared_bucket(self):
+        # Two limiters on one bucket share its rate, like two workers on one Redis
+        bucket = MemoryTokenBucket()
+        limiters = [create_rate_limiter("memory", rate=20) for _ in range(2)]
+        for limiter in limiters:
+            limiter.backend = bucket
+        started = time.monotonic()
+        await asyncio.gather(*[limiter.acquire() for limiter in limiters for _ in range(3)])
+        self.assertGreaterEqual(time.monotonic() - started, 0.24)
+
+    async def test_unavailable_backend_falls_back_to_local_limit(self):
+        limiter = create_rate_limiter("memory", rate=1000)
+        limiter.backend.reserve = mock.AsyncMock(side_effect=ConnectionError("down"))
+        await limiter.acquire()
+        self.assertEqual(limiter.stats()["backend_errors"], 1)
+
+class AdaptiveRateLimiterTests(unittest.TestCase):
+    def limiter(self, **kwargs) -> AdaptiveRateLimiter:
+        options = dict(rate=4, min_rate=1, max_rate=8, increase=1, decrease=0.5, window=3, cooldown=0)
+        options.update(kwargs)
+        return AdaptiveRateLimiter(**options)
+
+    def test_backs_off_on_throttling_status(self):
+        limiter = self.limiter()
+        limiter.record(0.1, ok=False, status=429)
+        self.assertEqual(limiter.current_rate, 2)
+        limiter.record(0.1, ok=False, status=503)
+        limiter.record(0.1, ok=False)
+        self.assertEqual(limiter.current_rate, 1)
+
+    def test_backs_off_once_per_cooldown(self):
+        limiter = self.limiter(cooldown=60)
+        limiter.record(0.1, ok=False, status=429)
+        limiter.record(0.1, ok=False, status=429)
+        self.assertEqual(limiter.current_rate, 2)
+
+    def test_increases_after_healthy_window(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.record(0.1)
+        self.assertEqual(limiter.current_rate, 5)
+        for _ in range(30):
+            limiter.record(0.1)
+        self.assertEqual(limiter.current_rate, 8)
+
+    def test_backs_off_on_slow_response(self):
+        limiter = self.limiter()
+        limiter.record(0.1)
+        limiter.record(0.5)
+        self.assertEqual(limiter.current_rate, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from .metrics import RENDER_TIMEOUTS, RENDER_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Reads the hidden user id cell of every result row, which identifies the rows the grid is showing
+GRID_ROWS_SCRIPT = """
+return Array.from(document.querySelectorAll("table tbody tr td[style='display:none;']"))
+    .map(function (cell) { return cell.textContent.trim(); })
+    .join(",");
+"""
+
+@dataclass
+class WaitStats:
+    durations: Dict[str, List[float]] = field(default_factory=dict)
+    timeouts: Dict[str, int] = field(default_factory=dict)
+    # Waits are recorded from the per-driver WebDriver threads
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, label: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.durations.setdefault(label, []).append(seconds)
+            if timed_out:
+                self.timeouts[label] = self.timeouts.get(label, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        with self._lock:
+            durations_by_label = {label: list(durations) for label, durations in self.durations.items()}
+        for label, durations in durations_by_label.items():
+            summary[label] = {
+                "count": len(durations),
+                "total": sum(durations),
+                "avg": sum(durations) / len(durations),
+                "max": max(durations),
+                "timeouts": self.timeouts.get(label, 0),
+            }
+        return summary
+
+    def log_summary(self):
+        for label, stats in self.summary().items():
+            logger.info(f"Wait '{label}': {stats['count']} waits, avg {stats['avg']:.2f}s, "
+                        f"max {stats['max']:.2f}s, {stats['timeouts']} timeouts")
+
+def wait_until(driver, condition: Callable, timeout: float, label: str, stats: WaitStats,
+               poll_frequency: float = 0.2) -> bool:
+    """Wait for ``condition`` and record how long it took; returns False on timeout."""
+    start = time.monotonic()
+    timed_out = False
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(condition)
+    except TimeoutException:
+        timed_out = True
+        logger.warning(f"Timed out after {timeout}s waiting for {label}")
+    elapsed = time.monotonic() - start
+    stats.record(label, elapsed, timed_out)
+    RENDER_WAIT.observe(elapsed, wait=label)
+    if timed_out:
+        RENDER_TIMEOUTS.inc(wait=label)
+    logger.debug(f"Waited {elapsed:.2f}s for {label}")
+    return not timed_out
+
+def grid_rows_signature(driver) -> str:
+    return driver.execute_script(GRID_ROWS_SCRIPT) or ""
+
+def grid_rows_changed(previous_signature: str):
+    # Telerik grids re-render over AJAX; the page is ready once a non-empty, different row set is shown
+    def _condition(driver):
+        signature = grid_rows_signature(driver)
+        return bool(signature) and signature != previous_signature
+    return _condition
+
+def elements_present(*locators):
+    def _condition(driver):
+        return all(driver.find_elements(*locator) for locator in locators)
+    return _condition
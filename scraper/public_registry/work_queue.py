@@ -0,0 +1,84 @@
+import asyncio
+import itertools
+import math
+import time
+from typing import Iterable, Optional, Set
+from .metrics import QUEUE_DWELL
+
+# Lower runs first; ids re-queued from a checkpoint go ahead of newly discovered ones
+RESUME_PRIORITY = 0
+DEFAULT_PRIORITY = 10
+DEFAULT_MAX_SIZE = 1000
+
+class WorkQueue:
+    # User ids handed from the search stage to the registrant workers. Every id is accepted
+    # at most once per crawl (later puts are dropped), a full queue makes put() wait so the
+    # search can't run arbitrarily far ahead of the workers, and lower priorities come out first.
+    # None is the workers' stop signal and is queued behind all remaining work.
+    def __init__(self, maxsize: int = DEFAULT_MAX_SIZE):
+        self._queue = asyncio.PriorityQueue(maxsize)
+        self._seen: Set[str] = set()
+        # Keeps FIFO order within a priority and means ids themselves are never compared
+        self._order = itertools.count()
+        self.duplicates = 0
+
+    async def put(self, user_id: Optional[str], priority: int = DEFAULT_PRIORITY) -> bool:
+        """Queue user_id unless it was seen before; returns whether it was queued."""
+        if user_id is None:
+            await self._queue.put((math.inf, next(self._order), None, None))
+            return True
+        if not self._accept(user_id):
+            return False
+        await self._queue.put((priority, next(self._order), user_id, time.monotonic()))
+        return True
+
+    def put_nowait(self, user_id: str, priority: int = DEFAULT_PRIORITY) -> bool:
+        if not self._accept(user_id):
+            return False
+        self._queue.put_nowait((priority, next(self._order), user_id, time.monotonic()))
+        return True
+
+    def _accept(self, user_id: str) -> bool:
+        # Marked before any wait for space, so a concurrent put of the same id is dropped
+        if user_id in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(user_id)
+        return True
+
+    def mark_seen(self, user_ids: Iterable[str]):
+        """Never queue these ids, e.g. ones an earlier run of the crawl already scraped."""
+        self._seen.update(user_ids)
+
+    async def get(self) -> Optional[str]:
+        return self._taken(await self._queue.get())
+
+    def get_nowait(self) -> Optional[str]:
+        return self._taken(self._queue.get_nowait())
+
+    @staticmethod
+    def _taken(item) -> Optional[str]:
+        _, _, user_id, queued_at = item
+        if queued_at is not None:
+            QUEUE_DWELL.observe(time.monotonic() - queued_at)
+        return user_id
+
+    def task_done(self):
+        self._queue.task_done()
+
+    async def join(self):
+        await self._queue.join()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    @property
+    def maxsize(self) -> int:
+        return self._queue.maxsize
+
+    @property
+    def seen(self) -> int:
+        return len(self._seen)
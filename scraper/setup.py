@@ -5,7 +5,9 @@ setup(
     version='0.1',
     packages=find_packages(),
     install_requires=[
+        'aiohttp>=3.8.0',
         'bs4>=0.0.1',
+        'lxml>=4.9.0',
         'requests>=2.25.0',
         'selenium>=4.0.0',
         'webdriver-manager>=3.5.0',